@@ -0,0 +1,142 @@
+import random
+import struct
+import zlib
+from pathlib import Path
+
+
+def generate_markdown_document(
+    *,
+    sections: int,
+    table_rows: int = 10,
+    table_columns: int = 4,
+    code_lines: int = 10,
+    references: int | None = None,
+    assets_dir: Path | None = None,
+    seed: int = 0,
+) -> str:
+    # NOTE: Images and included code files are only used if there is a directory
+    # with them (see 'write_document_assets'). Their paths are relative to the
+    # current directory, like the paths of the documents built by Scholar.
+    rng = random.Random(seed)
+    references = references if references is not None else sections
+    chunks = [
+        "# Benchmark\n",
+        "## Contents {.contents}\n",
+        "::: {#table-of-contents}\n:::\n",
+    ]
+
+    if assets_dir is not None:
+        assets_path = assets_dir.relative_to(Path.cwd()).as_posix()
+        image_files = [f"{assets_path}/picture.svg", f"{assets_path}/picture.png"]
+        include_file: str | None = f"{assets_path}/example.py"
+    else:
+        image_files = ["picture.png"]
+        include_file = None
+
+    for section in range(1, sections + 1):
+        chunks.append(f"## Section {section} {{#section-{section}}}\n")
+
+        for subsection in range(1, 4):
+            chunks.append(f"### Subsection {section}.{subsection}\n")
+            chunks.append(_generate_paragraph(rng, section) + "\n")
+            chunks.append(
+                f'{{caption="Table {section}.{subsection}" #table-{section}-{subsection}}}\n'
+                + _generate_pipe_table(rng, rows=table_rows, columns=table_columns)
+            )
+
+            if include_file is not None and subsection == 3:
+                chunks.append(
+                    f'{{caption="Listing {section}.{subsection}" #listing-{section}-{subsection} include="{include_file}" from=1 to={code_lines}}}\n'
+                    + "```python\n```\n"
+                )
+            else:
+                chunks.append(
+                    f'{{caption="Listing {section}.{subsection}" #listing-{section}-{subsection}}}\n'
+                    + "```python\n"
+                    + _generate_code(code_lines)
+                    + "\n```\n"
+                )
+
+            chunks.append(
+                f"$$\nx_{{{subsection}}} = \\frac{{a + {section}}}{{b}}\n$${{#math-{section}-{subsection}}}\n"
+            )
+            chunks.append(
+                f"![Figure {section}.{subsection}]({image_files[subsection % len(image_files)]})"
+                f"{{#figure-{section}-{subsection}}}\n"
+            )
+            chunks.append(
+                f"See [#](#table-{section}-{subsection}), "
+                f"[#](#listing-{section}-{subsection}) and "
+                f"[#](#math-{section}-{subsection}), also `code`{{.python}} "
+                f"[@](#reference-{(section - 1) % max(references, 1) + 1}).\n"
+            )
+
+    chunks.append("## References {.side}\n")
+    chunks.append("::: {#list-of-references}\n:::\n")
+
+    return "\n".join(chunks)
+
+
+def generate_references(*, sections: int) -> dict[str, str]:
+    return {
+        f"reference-{section}": f"Author {section}. **Book {section}**. Publisher, 2000."
+        for section in range(1, sections + 1)
+    }
+
+
+def write_document_assets(assets_dir: Path, *, code_lines: int = 10) -> None:
+    assets_dir.mkdir(parents=True, exist_ok=True)
+
+    (assets_dir / "picture.svg").write_text(
+        '<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">'
+        '<circle cx="50" cy="50" r="40" fill="teal"/></svg>\n'
+    )
+    (assets_dir / "picture.png").write_bytes(_generate_png(width=100, height=100))
+    (assets_dir / "example.py").write_text(_generate_code(code_lines) + "\n")
+
+
+def _generate_paragraph(rng: random.Random, section: int) -> str:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "*consectetur*", "**elit**"]
+    return " ".join(rng.choice(words) for _ in range(120)) + "."
+
+
+def _generate_pipe_table(rng: random.Random, *, rows: int, columns: int) -> str:
+    lines = [
+        "| " + " | ".join(f"Column {c}" for c in range(columns)) + " |",
+        "| " + " | ".join("---" for _ in range(columns)) + " |",
+    ]
+
+    for _ in range(rows):
+        lines.append(
+            "| " + " | ".join(str(rng.randint(0, 1000)) for _ in range(columns)) + " |"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+def _generate_code(lines: int) -> str:
+    return "\n".join(
+        f"def function_{i}(x):\n    return x * {i}" for i in range((lines + 1) // 2)
+    )
+
+
+def _generate_png(*, width: int, height: int) -> bytes:
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + chunk_type
+            + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data))
+        )
+
+    # NOTE: A grayscale gradient, each row starts with the "no filter" byte.
+    rows = b"".join(
+        b"\x00" + bytes((x + y) % 256 for x in range(width)) for y in range(height)
+    )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
@@ -0,0 +1,191 @@
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from rich.markup import escape
+from rich.table import Table
+
+# NOTE: Timings shorter than this are too noisy to be called regressions.
+MIN_REGRESSION_TIME = 0.05
+
+
+class BenchmarkResult:
+    def __init__(
+        self,
+        *,
+        name: str,
+        times: list[float],
+        peak_memory_mib: float | None = None,
+    ) -> None:
+        self.name = name
+        self.times = times
+        self.peak_memory_mib = peak_memory_mib
+
+    @property
+    def median_time(self) -> float:
+        return statistics.median(self.times)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "median_time": self.median_time,
+            "min_time": min(self.times),
+            "peak_memory_mib": self.peak_memory_mib,
+        }
+
+
+def time_runs(run: Callable[[], Any], *, repeat: int) -> list[float]:
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def run_isolated(
+    function: Callable[..., Any], /, *, log_file: Path, **kwargs: Any
+) -> Any:
+    # NOTE: Each benchmark runs in a fresh process, so the peak memory it reports
+    # (see 'get_peak_memory_mib') belongs to it alone. The output of the build is
+    # redirected to the log file on the file descriptor level to keep the output
+    # of Pandoc and LaTeX out of the results.
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_run_logged, function, log_file, kwargs).result()
+
+
+def get_peak_memory_mib() -> float:
+    # NOTE: The peak resident set size of this process or of its largest
+    # subprocess (e.g. Pandoc), whichever is larger. Linux reports it in KiB.
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return max(self_usage.ru_maxrss, children_usage.ru_maxrss) / 1024
+
+
+def load_baseline(baseline_file: Path) -> dict[str, dict[str, Any]]:
+    with open(baseline_file) as f:
+        baseline: dict[str, dict[str, Any]] = json.load(f)["results"]
+    return baseline
+
+
+def save_baseline(baseline_file: Path, results: list[BenchmarkResult]) -> None:
+    baseline_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(baseline_file, "w") as f:
+        json.dump(
+            {"results": {result.name: result.to_json() for result in results}},
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def find_regressions(
+    results: list[BenchmarkResult],
+    baseline: dict[str, dict[str, Any]],
+    *,
+    threshold: float,
+) -> list[str]:
+    regressions = []
+
+    for result in results:
+        baseline_result = baseline.get(result.name)
+
+        if baseline_result is None:
+            continue
+
+        baseline_time = baseline_result["median_time"]
+
+        if (
+            result.median_time > baseline_time * (1 + threshold)
+            and result.median_time - baseline_time > MIN_REGRESSION_TIME
+        ):
+            regressions.append(result.name)
+
+    return regressions
+
+
+def make_results_table(
+    results: list[BenchmarkResult],
+    baseline: dict[str, dict[str, Any]] | None,
+    *,
+    regressions: list[str],
+) -> Table:
+    table = Table("Benchmark", "Median, s", "Min, s", "Peak memory, MiB")
+
+    if baseline is not None:
+        table.add_column("Baseline, s")
+        table.add_column("Change")
+
+    for result in results:
+        row = [
+            escape(result.name),
+            f"{result.median_time:.3f}",
+            f"{min(result.times):.3f}",
+            (
+                f"{result.peak_memory_mib:.0f}"
+                if result.peak_memory_mib is not None
+                else "-"
+            ),
+        ]
+
+        if baseline is not None:
+            baseline_result = baseline.get(result.name)
+
+            if baseline_result is None:
+                row.extend(["-", "new"])
+            else:
+                baseline_time = baseline_result["median_time"]
+                change = (
+                    f"{(result.median_time / baseline_time - 1) * 100:+.0f}%"
+                    if baseline_time > 0
+                    else "-"
+                )
+                row.extend(
+                    [
+                        f"{baseline_time:.3f}",
+                        f"[red]{change}" if result.name in regressions else change,
+                    ]
+                )
+
+        table.add_row(*row)
+
+    return table
+
+
+def _run_logged(
+    function: Callable[..., Any], log_file: Path, kwargs: dict[str, Any]
+) -> Any:
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(log_file, "w") as log:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_stdout_fd = os.dup(1)
+        saved_stderr_fd = os.dup(2)
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+
+        try:
+            return function(**kwargs)
+        except Exception:
+            traceback.print_exc()
+            raise
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_stdout_fd, 1)
+            os.dup2(saved_stderr_fd, 2)
+            os.close(saved_stdout_fd)
+            os.close(saved_stderr_fd)
@@ -0,0 +1,146 @@
+import json
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+import rich
+import typer
+from rich.table import Table
+
+from benchmarks.documents import generate_markdown_document, generate_references
+from benchmarks.harness import time_runs
+from scholar.__main__ import load_settings, make_md_to_tex_converter
+from scholar.build_dirs import BuildDirs
+from scholar.caches import make_cache_key
+from scholar.constants import PANDOC_LUA_FILTERS_DIR, WORK_DIR
+from scholar.converters import MarkdownToLaTeXConverter
+from scholar.styles import DEFAULT_STYLE
+
+# NOTE: These are the filters in the order in which Scholar used to pass them to
+# Pandoc one by one before they were fused by 'run_scholar_filters.lua'.
+UNFUSED_LUA_FILTERS = [
+    "render_table.lua",
+    "render_image.lua",
+    "render_math.lua",
+    "include_code_block.lua",
+    "trim_code_block.lua",
+    "render_code_block.lua",
+    "render_code.lua",
+    "render_link_reference.lua",
+    "render_link_citation.lua",
+    "render_div_list_of_references.lua",
+    "render_div_table_of_contents.lua",
+    "make_and_render_sections.lua",
+    "convert_image_from_svg_to_pdf.lua",
+]
+FUSED_LUA_FILTERS = ["run_scholar_filters.lua"]
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    sections: int = typer.Option(100, help="The number of sections to generate."),
+    repeat: int = typer.Option(3, help="The number of runs of each variant."),
+) -> None:
+    """
+    Compare running the Lua filters one by one with running them fused.
+    """
+
+    settings = load_settings(
+        cli_settings={"style": DEFAULT_STYLE, "title_page": None},
+        yaml_front_matter_settings={
+            "references": generate_references(sections=sections)
+        },
+        yaml_config_file=None,
+    )
+    converter = make_md_to_tex_converter(
+        settings, BuildDirs(cache_dir=settings.cache_dir, work_dir=WORK_DIR)
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        md_file = Path(temp_dir) / "benchmark.md"
+        md_file.write_text(generate_markdown_document(sections=sections))
+
+        content_doc = json.loads(
+            converter._run_pandoc_from_md_to_json(input_md_file=md_file)
+        )
+        metadata = converter._make_metadata()
+        content_doc["meta"].update(
+            json.loads(
+                converter._make_metadata_meta_json(
+                    metadata,
+                    cache_key=make_cache_key(json.dumps(metadata, default=str)),
+                )
+            )
+        )
+        json_file = Path(temp_dir) / "benchmark.json"
+        json_file.write_text(json.dumps(content_doc, ensure_ascii=False))
+
+        outputs: dict[str, str] = {}
+        timings: dict[str, list[float]] = {}
+
+        for name, lua_filters in [
+            ("unfused", UNFUSED_LUA_FILTERS),
+            ("fused", FUSED_LUA_FILTERS),
+        ]:
+            timings[name] = time_runs(
+                lambda: outputs.__setitem__(
+                    name,
+                    _run_pandoc_from_json_to_tex(
+                        converter, json_file=json_file, lua_filters=lua_filters
+                    ),
+                ),
+                repeat=repeat,
+            )
+
+    table = Table("Variant", "Filters", "Median, s", "Min, s")
+    for name, lua_filters in [
+        ("unfused", UNFUSED_LUA_FILTERS),
+        ("fused", FUSED_LUA_FILTERS),
+    ]:
+        table.add_row(
+            name,
+            str(len(lua_filters)),
+            f"{statistics.median(timings[name]):.3f}",
+            f"{min(timings[name]):.3f}",
+        )
+    rich.print(table)
+
+    if outputs["unfused"] != outputs["fused"]:
+        rich.print("[bold red]Error: [/bold red]The outputs of the variants differ")
+        raise typer.Exit(1)
+
+    rich.print("[bold green]The outputs of the variants are identical")
+
+
+def _run_pandoc_from_json_to_tex(
+    converter: MarkdownToLaTeXConverter, *, json_file: Path, lua_filters: list[str]
+) -> str:
+    lua_filter_options = []
+    for lua_filter in lua_filters:
+        lua_filter_options.extend(
+            ["--lua-filter", str(PANDOC_LUA_FILTERS_DIR / lua_filter)]
+        )
+
+    return subprocess.check_output(
+        [
+            "pandoc",
+            "--from",
+            "json",
+            "--to",
+            converter._make_latex_pandoc_output_format(),
+            "--standalone",
+            "--template",
+            str(converter.style.template_file),
+            *converter._make_latex_pandoc_writer_options(),
+            *lua_filter_options,
+            str(json_file),
+        ],
+        text=True,
+    )
+
+
+if __name__ == "__main__":
+    app()
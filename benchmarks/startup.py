@@ -0,0 +1,131 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+import rich
+import typer
+
+from benchmarks.harness import (
+    BenchmarkResult,
+    find_regressions,
+    load_baseline,
+    make_results_table,
+    save_baseline,
+    time_runs,
+)
+
+# NOTE: These are the commands that don't build anything, so they shouldn't pay
+# for importing the converters.
+STARTUP_COMMANDS = {
+    "import": [sys.executable, "-c", "import scholar.__main__"],
+    "--help": [sys.executable, "-m", "scholar", "--help"],
+    "--styles": [sys.executable, "-m", "scholar", "--styles"],
+}
+
+# NOTE: The modules that are only needed when a build runs. Pygments isn't on the
+# list because Typer imports it for its help.
+HEAVY_MODULES = [
+    "frontmatter",
+    "panflute",
+    "pydantic",
+    "yaml",
+    "scholar.converters",
+    "scholar.highlighting",
+    "scholar.settings",
+]
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    repeat: int = typer.Option(10, min=1, help="The number of runs of each command."),
+    baseline_file: Optional[Path] = typer.Option(
+        None,
+        "--baseline",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="Compare the results with a baseline saved earlier.",
+    ),
+    save_baseline_file: Optional[Path] = typer.Option(
+        None,
+        "--save-baseline",
+        dir_okay=False,
+        writable=True,
+        help="Save the results as a baseline.",
+    ),
+    threshold: float = typer.Option(
+        0.2,
+        help="How much slower than the baseline a command may get (0.2 is 20%).",
+    ),
+) -> None:
+    """
+    Benchmark the startup time of the commands that don't build anything.
+
+    The startup time depends on the machine, so it is only checked against a
+    baseline saved on the same machine. The modules that are imported on
+    startup are always checked.
+    """
+
+    results = [
+        BenchmarkResult(
+            name=name,
+            times=time_runs(
+                lambda: subprocess.run(command, stdout=subprocess.DEVNULL, check=True),
+                repeat=repeat,
+            ),
+        )
+        for name, command in STARTUP_COMMANDS.items()
+    ]
+    baseline = load_baseline(baseline_file) if baseline_file is not None else None
+    regressions = (
+        find_regressions(results, baseline, threshold=threshold)
+        if baseline is not None
+        else []
+    )
+
+    rich.print(make_results_table(results, baseline, regressions=regressions))
+
+    if save_baseline_file is not None:
+        save_baseline(save_baseline_file, results)
+        rich.print(f"[bold yellow]Saved the baseline to {save_baseline_file}")
+
+    failed = False
+
+    if imported_heavy_modules := _get_imported_heavy_modules():
+        rich.print(
+            "[bold red]Error: [/bold red]Imported on startup: "
+            + ", ".join(imported_heavy_modules),
+            file=sys.stderr,
+        )
+        failed = True
+
+    if regressions:
+        rich.print(
+            "[bold red]Error: [/bold red]Slower than the baseline: "
+            + ", ".join(regressions),
+            file=sys.stderr,
+        )
+        failed = True
+
+    if failed:
+        raise typer.Exit(1)
+
+
+def _get_imported_heavy_modules() -> list[str]:
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, scholar.__main__; print('\\n'.join(sys.modules))",
+        ],
+        text=True,
+    )
+    imported_modules = set(output.splitlines())
+    return [m for m in HEAVY_MODULES if m in imported_modules]
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,252 @@
+import shutil
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Optional
+
+import rich
+import typer
+from rich.markup import escape
+
+from benchmarks.documents import (
+    generate_markdown_document,
+    generate_references,
+    write_document_assets,
+)
+from benchmarks.harness import (
+    BenchmarkResult,
+    find_regressions,
+    get_peak_memory_mib,
+    load_baseline,
+    make_results_table,
+    run_isolated,
+    save_baseline,
+)
+from scholar.__main__ import convert_md_to_tex, convert_tex_to_pdf, load_settings
+from scholar.build_dirs import BuildDirs
+from scholar.constants import WORK_DIR
+from scholar.profiling import enable_profiling
+from scholar.settings import Settings
+from scholar.styles import DEFAULT_STYLE
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    sections: list[int] = typer.Option(
+        [25, 100],
+        "--sections",
+        help="The number of sections to generate (repeat to benchmark many sizes).",
+    ),
+    table_rows: int = typer.Option(10, help="The number of rows of each table."),
+    table_columns: int = typer.Option(4, help="The number of columns of each table."),
+    code_lines: int = typer.Option(10, help="The number of lines of each listing."),
+    references: Optional[int] = typer.Option(
+        None,
+        help="The number of references.",
+        show_default="the number of sections",  # type: ignore[arg-type]  # See https://github.com/tiangolo/typer/issues/158
+    ),
+    repeat: int = typer.Option(3, min=1, help="The number of runs of each stage."),
+    pdf: bool = typer.Option(True, help="Benchmark the LaTeX to PDF stage too."),
+    baseline_file: Optional[Path] = typer.Option(
+        None,
+        "--baseline",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="Compare the results with a baseline saved earlier.",
+    ),
+    save_baseline_file: Optional[Path] = typer.Option(
+        None,
+        "--save-baseline",
+        dir_okay=False,
+        writable=True,
+        help="Save the results as a baseline.",
+    ),
+    threshold: float = typer.Option(
+        0.2,
+        help="How much slower than the baseline a benchmark may get (0.2 is 20%).",
+    ),
+) -> None:
+    """
+    Benchmark the stages of a build on generated documents of different sizes.
+    """
+
+    results: list[BenchmarkResult] = []
+
+    for sections_ in sections:
+        references_ = references if references is not None else sections_
+        scale = f"sections={sections_}"
+        benchmark_dir = WORK_DIR / "benchmarks" / scale.replace("=", "-")
+
+        shutil.rmtree(benchmark_dir, ignore_errors=True)
+        write_document_assets(benchmark_dir / "assets", code_lines=code_lines)
+        document_file = benchmark_dir / "document.md"
+        document_file.write_text(
+            generate_markdown_document(
+                sections=sections_,
+                table_rows=table_rows,
+                table_columns=table_columns,
+                code_lines=code_lines,
+                references=references_,
+                assets_dir=benchmark_dir / "assets",
+            )
+        )
+
+        rich.print(f"[bold yellow]Benchmarking Markdown to LaTeX ({scale})")
+        stage_results = _run_stage(
+            _benchmark_md_to_tex,
+            log_file=benchmark_dir / "md-to-tex.log",
+            document_file=document_file,
+            references=references_,
+            benchmark_dir=benchmark_dir,
+            repeat=repeat,
+        )
+
+        if pdf:
+            rich.print(f"[bold yellow]Benchmarking LaTeX to PDF ({scale})")
+            stage_results.extend(
+                _run_stage(
+                    _benchmark_tex_to_pdf,
+                    log_file=benchmark_dir / "tex-to-pdf.log",
+                    document_file=document_file,
+                    references=references_,
+                    benchmark_dir=benchmark_dir,
+                    repeat=repeat,
+                )
+            )
+
+        for result in stage_results:
+            result.name = f"{result.name} [{scale}]"
+            results.append(result)
+
+    baseline = load_baseline(baseline_file) if baseline_file is not None else None
+    regressions = (
+        find_regressions(results, baseline, threshold=threshold)
+        if baseline is not None
+        else []
+    )
+
+    rich.print(make_results_table(results, baseline, regressions=regressions))
+
+    if save_baseline_file is not None:
+        save_baseline(save_baseline_file, results)
+        rich.print(f"[bold yellow]Saved the baseline to {save_baseline_file}")
+
+    if regressions:
+        rich.print(
+            "[bold red]Error: [/bold red]Slower than the baseline: "
+            + escape(", ".join(regressions)),
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+
+def _run_stage(
+    benchmark: Callable[..., tuple[dict[str, list[float]], float]],
+    *,
+    log_file: Path,
+    **kwargs: Any,
+) -> list[BenchmarkResult]:
+    try:
+        stage_times, peak_memory_mib = run_isolated(
+            benchmark, log_file=log_file, **kwargs
+        )
+    except (typer.Exit, Exception):
+        rich.print(
+            f"[bold red]Error: [/bold red]The benchmark failed, see {log_file}",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    # NOTE: The peak memory is measured for the whole stage, so it is only
+    # reported for the stage itself and not for its parts.
+    return [
+        BenchmarkResult(
+            name=name,
+            times=times,
+            peak_memory_mib=peak_memory_mib if i == 0 else None,
+        )
+        for i, (name, times) in enumerate(stage_times.items())
+    ]
+
+
+def _benchmark_md_to_tex(
+    *, document_file: Path, references: int, benchmark_dir: Path, repeat: int
+) -> tuple[dict[str, list[float]], float]:
+    stage_times: dict[str, list[float]] = {
+        "md-to-tex": [],
+        "md-to-tex (up to date)": [],
+    }
+
+    for i in range(repeat):
+        settings, build_dirs = _make_build(
+            benchmark_dir / f"md-to-tex-{i}", references=references
+        )
+
+        # NOTE: The spans of the profiler time the Pandoc passes and each of the
+        # Lua filters.
+        with enable_profiling() as profiler:
+            start = time.perf_counter()
+            convert_md_to_tex(document_file, settings, build_dirs)
+            stage_times["md-to-tex"].append(time.perf_counter() - start)
+
+        for span in profiler.spans:
+            if span.category in ["pandoc", "lua_filter"]:
+                stage_times.setdefault(span.name, []).append(
+                    span.wall_time_ns / 1_000_000_000
+                )
+
+        start = time.perf_counter()
+        convert_md_to_tex(document_file, settings, build_dirs)
+        stage_times["md-to-tex (up to date)"].append(time.perf_counter() - start)
+
+    return stage_times, get_peak_memory_mib()
+
+
+def _benchmark_tex_to_pdf(
+    *, document_file: Path, references: int, benchmark_dir: Path, repeat: int
+) -> tuple[dict[str, list[float]], float]:
+    # NOTE: The LaTeX file (and the resources it refers to) is the one generated
+    # by the first run of the Markdown to LaTeX benchmark.
+    _, md_to_tex_build_dirs = _make_build(
+        benchmark_dir / "md-to-tex-0", references=references
+    )
+    tex_file = (
+        md_to_tex_build_dirs.pandoc_output_dir / document_file.with_suffix(".tex").name
+    )
+
+    stage_times: dict[str, list[float]] = {"tex-to-pdf": []}
+
+    for i in range(repeat):
+        settings, build_dirs = _make_build(
+            benchmark_dir / f"tex-to-pdf-{i}", references=references
+        )
+        start = time.perf_counter()
+        convert_tex_to_pdf(tex_file, settings, build_dirs)
+        stage_times["tex-to-pdf"].append(time.perf_counter() - start)
+
+    return stage_times, get_peak_memory_mib()
+
+
+def _make_build(run_dir: Path, *, references: int) -> tuple[Settings, BuildDirs]:
+    # NOTE: Every run has its own cache directory, so no run reuses the results of
+    # another one.
+    settings = load_settings(
+        cli_settings={
+            "style": DEFAULT_STYLE,
+            "cache_dir": run_dir / "cache",
+            "references": generate_references(sections=references),
+        },
+        yaml_front_matter_settings={},
+        yaml_config_file=None,
+    )
+    build_dirs = BuildDirs(cache_dir=settings.cache_dir, work_dir=run_dir / "work")
+    build_dirs.scholar_output_dir.mkdir(parents=True, exist_ok=True)
+    return settings, build_dirs
+
+
+if __name__ == "__main__":
+    app()
@@ -1,31 +1,28 @@
+import functools
 import shutil
 import sys
+from collections.abc import Sequence
 from pathlib import Path
-from typing import Any, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
 
-import frontmatter
 import rich
 import typer
+from rich.markup import escape
 
-from scholar.constants import (
-    EXTRACTED_TITLE_PAGE_FILE,
-    GENERATED_BIBLATEX_FILE,
-    LATEXMK_OUTPUT_DIR,
-    PANDOC_EXTRACTED_RESOURCES_DIR,
-    PANDOC_GENERATED_RESOURCES_DIR,
-    PANDOC_JSON_FILTERS_DIR,
-    PANDOC_LUA_FILTERS_DIR,
-    PANDOC_OUTPUT_DIR,
-    SCHOLAR_OUTPUT_DIR,
-)
-from scholar.converters import LaTeXToPDFConverter, MarkdownToLaTeXConverter
-from scholar.settings import (
-    ConfigFileNotFoundError,
-    FailedToLoadConfigFileError,
-    InvalidSettingsError,
-    Settings,
-)
-from scholar.styles import DEFAULT_STYLE, get_styles
+from scholar.build_dirs import BuildDirs
+from scholar.caches import file_lock, write_file_if_changed
+from scholar.constants import PANDOC_JSON_FILTERS_DIR, PANDOC_LUA_FILTERS_DIR, WORK_DIR
+from scholar.profiling import enable_profiling, profile
+from scholar.styles import DEFAULT_STYLE, get_style_names
+from scholar.watch import FileWatcher
+
+if TYPE_CHECKING:
+    # NOTE: These modules (and pydantic and YAML, which they import) are slow to
+    # import, as is frontmatter, so they are only imported when a build runs and
+    # '--help', '--styles' and shell completion stay fast. See
+    # 'benchmarks/startup.py'.
+    from scholar.converters import LaTeXToPDFConverter, MarkdownToLaTeXConverter
+    from scholar.settings import Settings
 
 app = typer.Typer()
 
@@ -34,19 +31,20 @@ T = TypeVar("T")
 
 def styles_callback(show_styles: bool) -> None:
     if show_styles:
-        print("\n".join(get_styles()))
+        print("\n".join(get_style_names()))
         raise typer.Exit()
 
 
 @app.command()
 def main(
-    input_file: Path = typer.Argument(
-        None,
-        metavar="INPUT",
+    input_files: list[Path] = typer.Argument(
+        ...,
+        metavar="INPUT...",
         exists=True,
         dir_okay=False,
         readable=True,
-        help="The input Markdown file.",
+        help="The input Markdown file, optionally followed by its chapter files.",
+        show_default=False,
     ),
     output_file_or_dir: Path = typer.Option(
         Path.cwd(),
@@ -89,6 +87,23 @@ def main(
         "--to-tex",
         help="Convert to LaTeX instead of PDF.",
     ),
+    draft: bool = typer.Option(
+        False,
+        "--draft",
+        help="Build a quick draft PDF (one LaTeX pass, no images, plain code).",
+    ),
+    watch: bool = typer.Option(
+        False,
+        "--watch",
+        help="Rebuild whenever the input files change.",
+    ),
+    profile_file: Optional[Path] = typer.Option(
+        None,
+        "--profile",
+        dir_okay=False,
+        writable=True,
+        help="Write a Chrome trace of the build to this file and show a summary.",
+    ),
     show_styles: bool = typer.Option(
         False,
         "--styles",
@@ -99,59 +114,253 @@ def main(
 ) -> None:
     """
     Convert the INPUT Markdown file to PDF.
+
+    The chapter files that follow INPUT are parsed separately and appended to
+    it in order. Their front matter is ignored.
     """
 
+    input_file, *chapter_files = input_files
+
+    build_ = functools.partial(
+        build,
+        input_file=input_file,
+        chapter_files=chapter_files,
+        output_file_or_dir=output_file_or_dir,
+        cli_settings={
+            "style": style,
+            "title_page": title_page,
+            # NOTE: Not passing '--draft' leaves it to the other settings sources.
+            **({"draft": True} if draft else {}),
+        },
+        config_file=config_file,
+        convert_from_tex=convert_from_tex,
+        convert_to_tex=convert_to_tex,
+        work_dir=WORK_DIR,
+    )
+
+    if profile_file is not None:
+        build_ = functools.partial(_profiled, build_, trace_file=profile_file)
+
+    if not watch:
+        build_()
+        return
+
+    watcher = FileWatcher(poll_interval=0.2, debounce_interval=0.3)
+    watched_input_files = [
+        f for f in [*input_files, config_file, title_page] if f is not None
+    ]
+    watched_dependency_files: list[Path] = []
+
+    try:
+        while True:
+            snapshot = watcher.take_snapshot(
+                watched_input_files + watched_dependency_files
+            )
+
+            # NOTE: A failed build keeps watching the files of the last successful
+            # one (which include the source images, see 'get_dependency_files').
+            try:
+                watched_dependency_files = build_()
+            except typer.Exit:
+                pass  # The error has already been reported, keep watching.
+            except Exception as e:
+                # NOTE: E.g. invalid YAML in the front matter.
+                rich.print(
+                    "[bold red]Error: [/bold red]The build failed: "
+                    + escape(f"{type(e).__name__}: {e}"),
+                    file=sys.stderr,
+                )
+
+            rich.print("[bold yellow]Watching for changes")
+            changed_files = watcher.wait_for_changes(
+                watched_input_files + watched_dependency_files, snapshot
+            )
+            rich.print(
+                "[bold yellow]Rebuilding because of changes in: "
+                + ", ".join(str(f) for f in changed_files)
+            )
+    except KeyboardInterrupt:
+        raise typer.Exit()
+
+
+def build(
+    *,
+    input_file: Path,
+    output_file_or_dir: Path,
+    cli_settings: dict[str, Any],
+    config_file: Path | None,
+    convert_from_tex: bool,
+    convert_to_tex: bool,
+    work_dir: Path,
+    yaml_config_file_settings: dict[str, Any] | None = None,
+    chapter_files: list[Path] | None = None,
+) -> list[Path]:
+    # NOTE: Builds that share a work directory would overwrite each other's files,
+    # so they run one after another.
+    with file_lock(
+        work_dir / "build.lock",
+        on_wait=lambda: rich.print(
+            "[bold yellow]Waiting for another build in the same work directory"
+        ),
+    ):
+        return _build(
+            input_file=input_file,
+            output_file_or_dir=output_file_or_dir,
+            cli_settings=cli_settings,
+            config_file=config_file,
+            convert_from_tex=convert_from_tex,
+            convert_to_tex=convert_to_tex,
+            work_dir=work_dir,
+            yaml_config_file_settings=yaml_config_file_settings,
+            chapter_files=chapter_files or [],
+        )
+
+
+def _build(
+    *,
+    input_file: Path,
+    output_file_or_dir: Path,
+    cli_settings: dict[str, Any],
+    config_file: Path | None,
+    convert_from_tex: bool,
+    convert_to_tex: bool,
+    work_dir: Path,
+    yaml_config_file_settings: dict[str, Any] | None,
+    chapter_files: list[Path],
+) -> list[Path]:
+    import frontmatter
+
+    if convert_from_tex and chapter_files:
+        rich.print(
+            "[bold red]Error: [/bold red]Chapter files can't be converted from LaTeX",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    chapter_documents = []
+
     if convert_from_tex:
         yaml_front_matter_settings = {}
-        md_file = None
+        input_document = None
     else:
-        with open(input_file) as f:
-            input_document = frontmatter.load(f)
+        with profile("Parse front matter"):
+            with open(input_file) as f:
+                input_document = frontmatter.load(f)
+
+            # NOTE: Only the front matter of the input file counts, chapters can
+            # have one (e.g. for their editors) but it is dropped.
+            for chapter_file in chapter_files:
+                with open(chapter_file) as f:
+                    chapter_documents.append(frontmatter.load(f))
 
         yaml_front_matter_settings = input_document.metadata
-        md_file = SCHOLAR_OUTPUT_DIR / input_file.name
 
-        SCHOLAR_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        with open(md_file, "w") as f:
-            f.write(input_document.content)
+    with profile("Load settings"):
+        settings = load_settings(
+            cli_settings=cli_settings,
+            yaml_front_matter_settings=yaml_front_matter_settings,
+            yaml_config_file=config_file,
+            yaml_config_file_settings=yaml_config_file_settings,
+        )
 
-    settings = load_settings(
-        cli_settings={
-            "style": style,
-            "title_page": title_page,
-        },
-        yaml_front_matter_settings=yaml_front_matter_settings,
-        yaml_config_file=config_file,
-    )
+    build_dirs = BuildDirs(cache_dir=settings.cache_dir, work_dir=work_dir)
+
+    if input_document is not None:
+        md_file = build_dirs.scholar_output_dir / input_file.name
+
+        build_dirs.scholar_output_dir.mkdir(parents=True, exist_ok=True)
+        write_file_if_changed(md_file, input_document.content.encode())
+    else:
+        md_file = None
+
+    # NOTE: Chapters are numbered because different directories can have chapter
+    # files with the same name.
+    chapter_md_files = [
+        build_dirs.scholar_chapters_output_dir / f"{i}-{chapter_file.name}"
+        for i, chapter_file in enumerate(chapter_files, start=1)
+    ]
+
+    if chapter_md_files:
+        build_dirs.scholar_chapters_output_dir.mkdir(parents=True, exist_ok=True)
+
+    for chapter_md_file, chapter_document in zip(chapter_md_files, chapter_documents):
+        write_file_if_changed(chapter_md_file, chapter_document.content.encode())
+
+    dependency_files = []
+
+    if settings.title_page:
+        dependency_files.append(settings.title_page)
 
     if convert_from_tex:
         tex_file = input_file
     else:
         assert md_file is not None
-        tex_file = convert_md_to_tex(md_file, settings)
+        tex_file = convert_md_to_tex(
+            md_file,
+            settings,
+            build_dirs,
+            chapter_files=chapter_md_files,
+            source_files=[input_file, *chapter_files],
+        )
+        dependency_files.extend(
+            make_md_to_tex_converter(settings, build_dirs).get_dependency_files(md_file)
+        )
 
     if convert_to_tex:
         file_to_output = tex_file
     else:
-        file_to_output = convert_tex_to_pdf(tex_file, settings)
+        file_to_output = convert_tex_to_pdf(tex_file, settings, build_dirs)
+        dependency_files.extend(
+            make_tex_to_pdf_converter(settings, build_dirs).get_dependency_files(
+                tex_file
+            )
+        )
 
     try:
         shutil.copy(file_to_output, output_file_or_dir)
     except shutil.SameFileError:
         pass
 
+    # NOTE: Files in the cache directory are produced by the build itself.
+    return [
+        f
+        for f in dict.fromkeys(dependency_files)
+        if not f.resolve().is_relative_to(build_dirs.cache_dir)
+        and not f.resolve().is_relative_to(build_dirs.work_dir)
+    ]
+
+
+def _profiled(build_: Callable[[], T], *, trace_file: Path) -> T:
+    with enable_profiling() as profiler:
+        try:
+            with profile("Build", category="build"):
+                return build_()
+        finally:
+            profiler.write_chrome_trace(trace_file)
+            rich.print(profiler.make_summary_table())
+            rich.print(f"[bold yellow]Wrote the trace to {trace_file}")
+
 
 def load_settings(
     *,
     cli_settings: dict[str, Any],
     yaml_front_matter_settings: dict[str, Any],
     yaml_config_file: Path | None,
-) -> Settings:
+    yaml_config_file_settings: dict[str, Any] | None = None,
+) -> "Settings":
+    from scholar.settings import (
+        ConfigFileNotFoundError,
+        FailedToLoadConfigFileError,
+        InvalidSettingsError,
+        Settings,
+    )
+
     try:
         settings = Settings(
             _cli_settings=cli_settings,
             _yaml_front_matter_settings=yaml_front_matter_settings,
             _yaml_config_file=yaml_config_file,
+            _yaml_config_file_settings=yaml_config_file_settings,
         )
     except ConfigFileNotFoundError as e:
         rich.print(
@@ -190,29 +399,68 @@ def load_settings(
     return settings
 
 
-def convert_md_to_tex(input_file: Path, settings: Settings) -> Path:
-    PANDOC_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    converter = MarkdownToLaTeXConverter(
+def convert_md_to_tex(
+    input_file: Path,
+    settings: "Settings",
+    build_dirs: BuildDirs,
+    *,
+    chapter_files: Sequence[Path] = (),
+    source_files: Sequence[Path] | None = None,
+) -> Path:
+    build_dirs.pandoc_output_dir.mkdir(parents=True, exist_ok=True)
+    converter = make_md_to_tex_converter(settings, build_dirs)
+    return converter.convert(
+        input_file, chapter_files=chapter_files, source_files=source_files
+    )
+
+
+def convert_tex_to_pdf(
+    input_file: Path, settings: "Settings", build_dirs: BuildDirs
+) -> Path:
+    build_dirs.latexmk_output_dir.mkdir(parents=True, exist_ok=True)
+    converter = make_tex_to_pdf_converter(settings, build_dirs)
+    return converter.convert(input_file)
+
+
+def make_md_to_tex_converter(
+    settings: "Settings", build_dirs: BuildDirs
+) -> "MarkdownToLaTeXConverter":
+    from scholar.converters import MarkdownToLaTeXConverter
+
+    return MarkdownToLaTeXConverter(
         pandoc_lua_filters_dir=PANDOC_LUA_FILTERS_DIR,
         pandoc_json_filters_dir=PANDOC_JSON_FILTERS_DIR,
-        pandoc_extracted_resources_dir=PANDOC_EXTRACTED_RESOURCES_DIR,
-        pandoc_generated_resources_dir=PANDOC_GENERATED_RESOURCES_DIR,
-        generated_biblatex_file=GENERATED_BIBLATEX_FILE,
-        extracted_title_page_file=EXTRACTED_TITLE_PAGE_FILE,
-        pandoc_output_dir=PANDOC_OUTPUT_DIR,
-        latexmk_output_dir=LATEXMK_OUTPUT_DIR,
+        pandoc_extracted_resources_dir=build_dirs.pandoc_extracted_resources_dir,
+        pandoc_generated_resources_dir=build_dirs.pandoc_generated_resources_dir,
+        generated_biblatex_file=build_dirs.generated_biblatex_file,
+        extracted_title_page_file=build_dirs.extracted_title_page_file,
+        pandoc_output_dir=build_dirs.pandoc_output_dir,
+        latexmk_output_dir=build_dirs.latexmk_output_dir,
+        references_cache_dir=build_dirs.references_cache_dir,
+        highlighting_cache_dir=build_dirs.highlighting_cache_dir,
+        pandoc_json_cache_dir=build_dirs.pandoc_json_cache_dir,
+        metadata_json_cache_dir=build_dirs.metadata_json_cache_dir,
+        pygments_style_defs_file=build_dirs.pygments_style_defs_file,
+        data_tables_dir=build_dirs.data_tables_dir,
+        build_manifest_file=build_dirs.md_to_tex_build_manifest_file,
         settings=settings,
     )
-    return converter.convert(input_file)
 
 
-def convert_tex_to_pdf(input_file: Path, settings: Settings) -> Path:
-    LATEXMK_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    converter = LaTeXToPDFConverter(
-        latexmk_output_dir=LATEXMK_OUTPUT_DIR,
+def make_tex_to_pdf_converter(
+    settings: "Settings", build_dirs: BuildDirs
+) -> "LaTeXToPDFConverter":
+    from scholar.converters import LaTeXToPDFConverter
+
+    return LaTeXToPDFConverter(
+        latexmk_output_dir=build_dirs.latexmk_output_dir,
+        optimized_pdf_output_dir=build_dirs.optimized_pdf_output_dir,
+        latex_formats_dir=build_dirs.latex_formats_dir,
+        split_tex_dir=build_dirs.split_tex_dir,
+        generated_biblatex_file=build_dirs.generated_biblatex_file,
+        build_manifest_file=build_dirs.tex_to_pdf_build_manifest_file,
         settings=settings,
     )
-    return converter.convert(input_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+import glob
+import hashlib
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Optional
+
+import rich
+import typer
+from rich.table import Table
+
+from scholar.__main__ import build
+from scholar.constants import WORK_DIR
+from scholar.settings import (
+    ConfigFileNotFoundError,
+    FailedToLoadConfigFileError,
+    load_yaml_config_file,
+)
+from scholar.styles import DEFAULT_STYLE
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    input_files: Optional[list[Path]] = typer.Argument(
+        None,
+        metavar="INPUT...",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="The input Markdown files.",
+    ),
+    input_glob: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="A glob pattern that matches more input Markdown files.",
+    ),
+    output_dir: Path = typer.Option(
+        Path.cwd(),
+        "--output",
+        "-o",
+        file_okay=False,
+        writable=True,
+        help="The output directory.",
+        show_default="CWD",  # type: ignore[arg-type]  # See https://github.com/tiangolo/typer/issues/158
+    ),
+    style: str = typer.Option(
+        DEFAULT_STYLE,
+        "--style",
+        help="The style to use.",
+    ),
+    config_file: Optional[
+        Path
+    ] = typer.Option(  # See https://github.com/tiangolo/typer/issues/348
+        None,
+        "--config",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="The YAML config file shared by all documents.",
+    ),
+    convert_to_tex: bool = typer.Option(
+        False,
+        "--to-tex",
+        help="Convert to LaTeX instead of PDF.",
+    ),
+    jobs: int = typer.Option(
+        os.cpu_count() or 1,
+        "--jobs",
+        "-j",
+        min=1,
+        help="The number of documents to build at the same time.",
+        show_default="CPU count",  # type: ignore[arg-type]  # See https://github.com/tiangolo/typer/issues/158
+    ),
+) -> None:
+    """
+    Convert many INPUT Markdown files to PDF.
+    """
+
+    input_files = list(input_files or [])
+
+    if input_glob is not None:
+        input_files.extend(
+            Path(f) for f in sorted(glob.glob(input_glob, recursive=True))
+        )
+
+    input_files = list(dict.fromkeys(f.resolve() for f in input_files))
+
+    if not input_files:
+        rich.print("[bold red]Error: [/bold red]No input files", file=sys.stderr)
+        raise typer.Exit(1)
+
+    output_suffix = ".tex" if convert_to_tex else ".pdf"
+    output_files = [output_dir / f.with_suffix(output_suffix).name for f in input_files]
+
+    if len(set(output_files)) != len(output_files):
+        rich.print(
+            "[bold red]Error: [/bold red]Some input files have the same name",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    # NOTE: The config file is parsed once here instead of once per document.
+    try:
+        yaml_config_file_settings = (
+            load_yaml_config_file(config_file) if config_file else None
+        )
+    except (ConfigFileNotFoundError, FailedToLoadConfigFileError) as e:
+        rich.print(
+            f"[bold red]Error: [/bold red]Failed to load config file: {e.config_file}",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rich.print(
+        f"[bold yellow]Building {len(input_files)} documents with {jobs} workers"
+    )
+
+    work_dirs = _make_work_dirs(input_files)
+    results: dict[Path, tuple[bool, float]] = {}
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                _build_document,
+                input_file=input_file,
+                output_file=output_file,
+                work_dir=work_dir,
+                cli_settings={"style": style},
+                config_file=config_file,
+                yaml_config_file_settings=yaml_config_file_settings,
+                convert_to_tex=convert_to_tex,
+            ): input_file
+            for input_file, output_file, work_dir in zip(
+                input_files, output_files, work_dirs
+            )
+        }
+
+        for future in as_completed(futures):
+            input_file = futures[future]
+
+            # NOTE: The build catches its own errors, so this only raises if the
+            # worker itself has died (e.g. it was killed for running out of memory
+            # or crashed in a native library). 'BrokenProcessPool' then fails all
+            # of the documents that haven't finished yet, but not the batch.
+            try:
+                is_successful, elapsed_time = future.result()
+            except Exception as e:
+                rich.print(
+                    f"[bold red]Error: [/bold red]The worker building {input_file} "
+                    f"failed: {type(e).__name__}: {e}",
+                    file=sys.stderr,
+                )
+                is_successful, elapsed_time = False, time.perf_counter() - start_time
+
+            results[input_file] = is_successful, elapsed_time
+
+            if is_successful:
+                rich.print(f"[bold green]Built[/bold green] {input_file}")
+            else:
+                rich.print(f"[bold red]Failed[/bold red] {input_file}")
+
+    elapsed_time = time.perf_counter() - start_time
+
+    table = Table("Document", "Status", "Time, s", "Log")
+    for input_file, work_dir in zip(input_files, work_dirs):
+        is_successful, document_elapsed_time = results[input_file]
+        table.add_row(
+            str(input_file),
+            "[green]OK" if is_successful else "[red]Failed",
+            f"{document_elapsed_time:.1f}",
+            str(_make_log_file(work_dir)),
+        )
+    rich.print(table)
+
+    failed_count = sum(not is_successful for is_successful, _ in results.values())
+    rich.print(
+        f"[bold yellow]Built {len(input_files) - failed_count} of {len(input_files)} "
+        f"documents in {elapsed_time:.1f} s"
+    )
+
+    if failed_count:
+        raise typer.Exit(1)
+
+
+def _build_document(
+    *,
+    input_file: Path,
+    output_file: Path,
+    work_dir: Path,
+    cli_settings: dict[str, Any],
+    config_file: Path | None,
+    yaml_config_file_settings: dict[str, Any] | None,
+    convert_to_tex: bool,
+) -> tuple[bool, float]:
+    start_time = time.perf_counter()
+    log_file = _make_log_file(work_dir)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+
+    # NOTE: The output of the build (including the output of Pandoc and LaTeX) is
+    # redirected on the file descriptor level so that the outputs of concurrent
+    # builds don't interleave.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_stdout_fd = os.dup(1)
+    saved_stderr_fd = os.dup(2)
+
+    with open(log_file, "w") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+
+        try:
+            build(
+                input_file=input_file,
+                output_file_or_dir=output_file,
+                cli_settings=cli_settings,
+                config_file=config_file,
+                convert_from_tex=False,
+                convert_to_tex=convert_to_tex,
+                work_dir=work_dir,
+                yaml_config_file_settings=yaml_config_file_settings,
+            )
+            is_successful = True
+        except (typer.Exit, Exception) as e:
+            if not isinstance(e, typer.Exit):
+                rich.print(
+                    f"[bold red]Error: [/bold red]{type(e).__name__}: {e}",
+                    file=sys.stderr,
+                )
+            is_successful = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_stdout_fd, 1)
+            os.dup2(saved_stderr_fd, 2)
+            os.close(saved_stdout_fd)
+            os.close(saved_stderr_fd)
+
+    return is_successful, time.perf_counter() - start_time
+
+
+def _make_work_dirs(input_files: list[Path]) -> list[Path]:
+    work_dirs = []
+
+    for input_file in input_files:
+        # NOTE: Paths inside of the work directory end up in LaTeX, so they must
+        # pass the checks in 'MarkdownToLaTeXConverter._make_metadata'. The hash
+        # keeps the work directory of a document the same between batches.
+        name = re.sub(r"[^A-Za-z0-9._\-]", "-", input_file.stem)
+        path_hash = hashlib.sha1(str(input_file).encode()).hexdigest()[:8]
+        work_dirs.append(WORK_DIR / "batch" / f"{name}-{path_hash}")
+
+    return work_dirs
+
+
+def _make_log_file(work_dir: Path) -> Path:
+    return work_dir / "build.log"
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+
+class BuildDirs:
+    def __init__(self, *, cache_dir: Path, work_dir: Path | None = None) -> None:
+        # NOTE: Caches that are keyed by content are shared by every document built
+        # with the same cache directory. Everything that is specific to a document
+        # lives in its work directory, so documents can be built concurrently if
+        # they have different work directories.
+        if work_dir is None:
+            work_dir = cache_dir
+
+        self.cache_dir = cache_dir
+        self.work_dir = work_dir
+
+        self.references_cache_dir = cache_dir / "references-cache"
+        self.highlighting_cache_dir = cache_dir / "highlighting-cache"
+        self.pandoc_json_cache_dir = cache_dir / "pandoc-json-cache"
+        self.metadata_json_cache_dir = cache_dir / "metadata-json-cache"
+        self.latex_formats_dir = cache_dir / "latex-formats"
+
+        self.md_to_tex_cache_dir = work_dir / "md-to-tex-cache"
+        self.tex_to_pdf_cache_dir = work_dir / "tex-to-pdf-cache"
+
+        self.md_to_tex_build_manifest_file = (
+            self.md_to_tex_cache_dir / "build-manifest.json"
+        )
+        self.tex_to_pdf_build_manifest_file = (
+            self.tex_to_pdf_cache_dir / "build-manifest.json"
+        )
+
+        self.scholar_output_dir = self.md_to_tex_cache_dir / "scholar-output"
+        self.scholar_chapters_output_dir = self.scholar_output_dir / "chapters"
+        self.generated_biblatex_file = self.scholar_output_dir / "bibliography.bib"
+        self.extracted_title_page_file = self.scholar_output_dir / "title-page.pdf"
+
+        self.pandoc_output_dir = self.md_to_tex_cache_dir / "pandoc-output"
+        self.pandoc_extracted_resources_dir = (
+            self.md_to_tex_cache_dir / "extracted-resources"
+        )
+        self.pandoc_generated_resources_dir = (
+            self.md_to_tex_cache_dir / "generated-resources"
+        )
+        self.pygments_style_defs_file = (
+            self.pandoc_generated_resources_dir / "pygments-style-defs.tex"
+        )
+        self.data_tables_dir = self.pandoc_generated_resources_dir / "data-tables"
+
+        self.split_tex_dir = self.tex_to_pdf_cache_dir / "split-tex"
+        self.latexmk_output_dir = self.tex_to_pdf_cache_dir / "latexmk-output"
+        self.optimized_pdf_output_dir = (
+            self.tex_to_pdf_cache_dir / "optimized-pdf-output"
+        )
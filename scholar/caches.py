@@ -0,0 +1,263 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+
+class ContentAddressedCache:
+    def __init__(self, cache_dir: Path, *, suffix: str = "") -> None:
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._make_cache_file(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, content: bytes) -> None:
+        # NOTE: Concurrent writers of the same key write the same content, so an
+        # atomic write is enough to share the cache between processes.
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(self._make_cache_file(key), content)
+
+    def _make_cache_file(self, key: str) -> Path:
+        return self.cache_dir / (key + self.suffix)
+
+
+class BuildManifest:
+    # NOTE: The files are hashed through a stat-keyed index that is kept next to
+    # the manifest, so unchanged rebuilds don't read the (possibly hundreds of)
+    # recorded files again.
+    def __init__(self, manifest_file: Path) -> None:
+        self.manifest_file = manifest_file
+        self.hash_index = FileHashIndex(
+            manifest_file.with_name(manifest_file.stem + ".hash-index.json")
+        )
+
+        try:
+            with open(manifest_file) as f:
+                self._stages: dict[str, Any] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._stages = {}
+
+    def is_stage_up_to_date(
+        self,
+        stage: str,
+        *,
+        inputs: Mapping[str, str | None],
+        output_files: Iterable[Path],
+    ) -> bool:
+        recorded_stage = self._stages.get(stage)
+
+        if recorded_stage is None or recorded_stage["inputs"] != dict(inputs):
+            return False
+
+        if set(recorded_stage["output_files"]) != {str(f) for f in output_files}:
+            return False
+
+        recorded_file_hashes = {
+            **recorded_stage["dependency_files"],
+            **recorded_stage["output_files"],
+        }
+
+        try:
+            return all(
+                self.hash_file(Path(file)) == recorded_file_hash
+                for file, recorded_file_hash in recorded_file_hashes.items()
+            )
+        finally:
+            self.hash_index.save()
+
+    def hash_file(self, file: Path) -> str | None:
+        try:
+            return self.hash_index.hash_file(file)
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def get_stage_inputs(self, stage: str) -> dict[str, str | None] | None:
+        recorded_stage = self._stages.get(stage)
+
+        if recorded_stage is None:
+            return None
+
+        inputs: dict[str, str | None] = recorded_stage["inputs"]
+        return inputs
+
+    def get_stage_dependency_files(self, stage: str) -> list[Path]:
+        recorded_stage = self._stages.get(stage)
+
+        if recorded_stage is None:
+            return []
+
+        return [Path(f) for f in recorded_stage["dependency_files"]]
+
+    def record_stage(
+        self,
+        stage: str,
+        *,
+        inputs: Mapping[str, str | None],
+        dependency_files: Iterable[Path],
+        output_files: Iterable[Path],
+    ) -> None:
+        self._stages[stage] = {
+            "inputs": dict(inputs),
+            "dependency_files": {str(f): self.hash_file(f) for f in dependency_files},
+            "output_files": {str(f): self.hash_file(f) for f in output_files},
+        }
+
+        self.hash_index.save()
+
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(
+            self.manifest_file, json.dumps(self._stages, indent=2).encode()
+        )
+
+
+class FileHashIndex:
+    # NOTE: Files are considered unchanged if their path, size, modification time
+    # and inode are the same as when they were hashed. Entries for files modified
+    # shortly before they were hashed are not saved because a change within the
+    # resolution of the file system's timestamps wouldn't change the stat (they
+    # are still used until the end of the build).
+    RACY_INTERVAL_NS = 2_000_000_000
+
+    def __init__(self, index_file: Path, *, algorithm: str = "sha256") -> None:
+        self.index_file = index_file
+        self.algorithm = algorithm
+        self._is_changed = False
+        self._racy_keys: set[str] = set()
+
+        try:
+            with open(index_file) as f:
+                self._entries: dict[str, Any] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def hash_file(self, file: Path) -> str:
+        key = str(file.resolve())
+        stat = file.stat()
+        stat_key = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+        entry = self._entries.get(key)
+        if entry is not None and entry["stat"] == stat_key:
+            file_hash: str = entry["hash"]
+            return file_hash
+
+        file_hash = _hash_file_with(file, self.algorithm)
+
+        self._entries[key] = {"stat": stat_key, "hash": file_hash}
+        self._is_changed = True
+
+        if time.time_ns() - stat.st_mtime_ns <= self.RACY_INTERVAL_NS:
+            self._racy_keys.add(key)
+        else:
+            self._racy_keys.discard(key)
+
+        return file_hash
+
+    def save(self) -> None:
+        if not self._is_changed:
+            return
+
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # NOTE: The index may be shared by concurrent processes, so the entries
+        # that they have saved in the meantime are merged with ours.
+        with file_lock(self.index_file.with_name(self.index_file.name + ".lock")):
+            try:
+                with open(self.index_file) as f:
+                    saved_entries: dict[str, Any] = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                saved_entries = {}
+
+            saved_entries.update(
+                {k: v for k, v in self._entries.items() if k not in self._racy_keys}
+            )
+            write_file_atomically(self.index_file, json.dumps(saved_entries).encode())
+
+        self._is_changed = False
+
+
+def hash_file(file: Path) -> str | None:
+    try:
+        return _hash_file_with(file, "sha256")
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+
+
+def make_cache_key(*parts: str | bytes) -> str:
+    h = hashlib.sha256()
+
+    for part in parts:
+        part_bytes = part.encode() if isinstance(part, str) else part
+        # NOTE: Each part is prefixed with its length so that different splits of
+        # the same bytes (e.g. "ab", "c" and "a", "bc") don't produce the same key.
+        h.update(len(part_bytes).to_bytes(8, "big"))
+        h.update(part_bytes)
+
+    return h.hexdigest()
+
+
+def write_file_if_changed(file: Path, content: bytes) -> bool:
+    try:
+        if file.read_bytes() == content:
+            return False
+    except FileNotFoundError:
+        pass
+
+    write_file_atomically(file, content)
+    return True
+
+
+def write_file_atomically(file: Path, content: bytes) -> None:
+    temp_file = make_temp_file(file)
+
+    try:
+        temp_file.write_bytes(content)
+        os.replace(temp_file, file)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+def make_temp_file(file: Path) -> Path:
+    # NOTE: The temporary file is created next to the file so that it can be
+    # renamed atomically, and its name is unique across processes and hosts that
+    # share the directory.
+    return file.with_name(f".{file.name}.{uuid.uuid4().hex}.tmp")
+
+
+@contextlib.contextmanager
+def file_lock(
+    lock_file: Path, *, on_wait: Callable[[], None] | None = None
+) -> Iterator[None]:
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(lock_file, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _hash_file_with(file: Path, algorithm: str) -> str:
+    h = hashlib.new(algorithm)
+
+    with open(file, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+
+    return h.hexdigest()
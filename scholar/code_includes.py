@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Any
+
+import rich
+
+from scholar.pandoc_json import get_element_attributes, iter_elements
+
+# NOTE: Included code blocks get this attribute instead of 'include', so that
+# 'include_code_block.lua' knows that they have already been included.
+INCLUDED_ATTRIBUTE = "included"
+
+
+class CodeIncluder:
+    def __init__(self) -> None:
+        self._indexed_files: dict[Path, _IndexedFile] = {}
+
+    def include_doc(self, doc: dict[str, Any]) -> int:
+        # NOTE: Code blocks that can't be included (e.g. the ones with invalid
+        # line numbers or missing files) are left to 'include_code_block.lua'
+        # which reports them.
+        included_count = 0
+
+        for element in iter_elements(doc, "CodeBlock"):
+            attributes = get_element_attributes(element)
+
+            if (include_filepath := attributes.get("include")) is None:
+                continue
+
+            try:
+                start_line_number = parse_line_number(attributes.get("from"))
+                end_line_number = parse_line_number(attributes.get("to"))
+            except ValueError:
+                continue
+
+            if (
+                start_line_number is not None
+                and end_line_number is not None
+                and start_line_number > end_line_number
+            ):
+                continue
+
+            try:
+                text = self._get_indexed_file(Path(include_filepath)).get_lines(
+                    start_line_number, end_line_number
+                )
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            if element["c"][1] != "":
+                rich.print(
+                    "[bold yellow]Warning: [/bold yellow]Code block has 'include' "
+                    "attribute, but also has text. The text will be ignored.",
+                )
+
+            # NOTE: CodeBlock is [Attr, text] and Attr is [identifier, classes,
+            # attributes].
+            element["c"][0][2] = [
+                [INCLUDED_ATTRIBUTE if key == "include" else key, value]
+                for key, value in element["c"][0][2]
+            ]
+            element["c"][1] = text
+            included_count += 1
+
+        return included_count
+
+    def _get_indexed_file(self, file: Path) -> "_IndexedFile":
+        # NOTE: Each file is read and indexed once, however many ranges of it are
+        # included.
+        key = file.resolve()
+
+        if (indexed_file := self._indexed_files.get(key)) is None:
+            indexed_file = _IndexedFile(file.read_bytes())
+            self._indexed_files[key] = indexed_file
+
+        return indexed_file
+
+
+class _IndexedFile:
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        # NOTE: The offsets of the starts of the lines. A newline at the end of
+        # the file doesn't start a new line, like in Lua's 'file:lines()'.
+        self.line_offsets = [0]
+
+        offset = content.find(b"\n")
+        while offset != -1 and offset + 1 < len(content):
+            self.line_offsets.append(offset + 1)
+            offset = content.find(b"\n", offset + 1)
+
+    def get_lines(
+        self, start_line_number: int | None, end_line_number: int | None
+    ) -> str:
+        line_count = len(self.line_offsets) if self.content else 0
+        start_index = (start_line_number or 1) - 1
+        end_index = min(end_line_number or line_count, line_count)
+
+        if start_index >= end_index:
+            return ""
+
+        start_offset = self.line_offsets[start_index]
+        end_offset = (
+            self.line_offsets[end_index]
+            if end_index < line_count
+            else len(self.content)
+        )
+
+        return self.content[start_offset:end_offset].removesuffix(b"\n").decode()
+
+
+def parse_line_number(value: str | None) -> int | None:
+    # NOTE: Line numbers are validated the same way 'include_code_block.lua'
+    # validates them.
+    if value is None:
+        return None
+
+    line_number = int(value)
+
+    if line_number < 1:
+        raise ValueError(f"Invalid line number: {line_number}")
+
+    return line_number
@@ -12,17 +12,8 @@ PANDOC_JSON_FILTERS_DIR = ROOT / "pandoc_json_filters"
 PANDOC_LUA_FILTERS_DIR = ROOT / "pandoc_filters"
 
 
+# NOTE: The default cache directory can be shared by many checkouts and
+# processes, while the work directory always belongs to the current directory.
+# Their layouts are defined by 'BuildDirs' in 'build_dirs.py'.
 CACHE_DIR = Path.cwd() / ".scholar"
-
-MD_TO_TEX_CACHE_DIR = CACHE_DIR / "md-to-tex-cache"
-TEX_TO_PDF_CACHE_DIR = CACHE_DIR / "tex-to-pdf-cache"
-
-SCHOLAR_OUTPUT_DIR = MD_TO_TEX_CACHE_DIR / "scholar-output"
-GENERATED_BIBLATEX_FILE = SCHOLAR_OUTPUT_DIR / "bibliography.bib"
-EXTRACTED_TITLE_PAGE_FILE = SCHOLAR_OUTPUT_DIR / "title-page.pdf"
-
-PANDOC_OUTPUT_DIR = MD_TO_TEX_CACHE_DIR / "pandoc-output"
-PANDOC_EXTRACTED_RESOURCES_DIR = MD_TO_TEX_CACHE_DIR / "extracted-resources"
-PANDOC_GENERATED_RESOURCES_DIR = MD_TO_TEX_CACHE_DIR / "generated-resources"
-
-LATEXMK_OUTPUT_DIR = TEX_TO_PDF_CACHE_DIR / "latexmk-output"
+WORK_DIR = Path.cwd() / ".scholar"
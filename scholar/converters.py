@@ -1,20 +1,61 @@
+import contextlib
+import csv
+import functools
+import hashlib
+import io
 import json
+import os
 import re
+import shlex
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
+import uuid
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
 from typing import Any
 
-import panflute
 import rich
 import typer
+from rich.markup import escape
 
+from scholar.caches import (
+    BuildManifest,
+    ContentAddressedCache,
+    make_cache_key,
+    make_temp_file,
+    write_file_if_changed,
+)
+from scholar.code_includes import CodeIncluder
+from scholar.data_tables import DataTableRenderer
+from scholar.images import RasterImageOptimizer, SVGToPDFImageConverter
+from scholar.latex_formats import LaTeXFormatBuilder
+from scholar.latex_sections import SplitLaTeXFile, split_latex_file
+from scholar.pandoc_json import (
+    get_dependency_files,
+    get_image_src,
+    iter_elements,
+    set_image_src,
+    write_doc,
+    write_meta,
+)
+from scholar.pdf_optimization import PDFOptimizer
+from scholar.profiling import (
+    LUA_FILTER_TIMES_FILE_ENV_VAR,
+    SUBPROCESS_SPANS_FILE_ENV_VAR,
+    get_profiler,
+    profile,
+)
 from scholar.settings import Settings
 from scholar.styles import get_style
+from scholar.validation import ContentValidator
+
+REFERENCES_CACHE_VERSION = "2"
 
 
 class Converter(ABC):
@@ -22,6 +63,10 @@ class Converter(ABC):
     def convert(self, input_file: Path) -> Path:
         pass
 
+    @abstractmethod
+    def get_dependency_files(self, input_file: Path) -> list[Path]:
+        pass
+
 
 class PandocFilterType(str, Enum):
     LUA = "lua"
@@ -48,6 +93,13 @@ class MarkdownToLaTeXConverter(Converter):
         extracted_title_page_file: Path,
         pandoc_output_dir: Path,
         latexmk_output_dir: Path,
+        references_cache_dir: Path,
+        highlighting_cache_dir: Path,
+        pandoc_json_cache_dir: Path,
+        metadata_json_cache_dir: Path,
+        pygments_style_defs_file: Path,
+        data_tables_dir: Path,
+        build_manifest_file: Path,
         settings: Settings,
     ) -> None:
         self.style = get_style(settings)
@@ -59,9 +111,28 @@ class MarkdownToLaTeXConverter(Converter):
         self.extracted_title_page_file = extracted_title_page_file
         self.pandoc_output_dir = pandoc_output_dir
         self.latexmk_output_dir = latexmk_output_dir
+        self.references_cache_dir = references_cache_dir
+        self.highlighting_cache_dir = highlighting_cache_dir
+        self.pandoc_json_cache_dir = pandoc_json_cache_dir
+        self.metadata_json_cache_dir = metadata_json_cache_dir
+        self.pygments_style_defs_file = pygments_style_defs_file
+        self.data_tables_dir = data_tables_dir
+        self.build_manifest_file = build_manifest_file
         self.settings = settings
 
-    def convert(self, input_file: Path) -> Path:
+    def convert(
+        self,
+        input_file: Path,
+        *,
+        chapter_files: Sequence[Path] = (),
+        source_files: Sequence[Path] | None = None,
+    ) -> Path:
+        # NOTE: The chapter files are parsed separately and their blocks are
+        # appended to the blocks of the input file in order. The source files are
+        # the files that the input and chapter files were made from (e.g. with
+        # their front matter), they are only used to report content problems.
+        md_files = [input_file, *chapter_files]
+
         metadata_json_file = (
             self.pandoc_output_dir / input_file.with_suffix(".metadata.json").name
         )
@@ -70,43 +141,287 @@ class MarkdownToLaTeXConverter(Converter):
         )
         output_tex_file = self.pandoc_output_dir / input_file.with_suffix(".tex").name
 
+        build_manifest = BuildManifest(self.build_manifest_file)
+
         if self.settings.title_page:
-            rich.print("[bold yellow]Extracting the title page file")
-            shutil.copy(self.settings.title_page, self.extracted_title_page_file)
+            title_page_stage = "title-page"
+            title_page_stage_inputs = {
+                "title_page": build_manifest.hash_file(self.settings.title_page),
+            }
+
+            if build_manifest.is_stage_up_to_date(
+                title_page_stage,
+                inputs=title_page_stage_inputs,
+                output_files=[self.extracted_title_page_file],
+            ):
+                rich.print("[bold yellow]Skipping title page extraction (up to date)")
+            else:
+                rich.print("[bold yellow]Extracting the title page file")
+                with profile("Extract title page"):
+                    shutil.copy(
+                        self.settings.title_page, self.extracted_title_page_file
+                    )
+                build_manifest.record_stage(
+                    title_page_stage,
+                    inputs=title_page_stage_inputs,
+                    dependency_files=[],
+                    output_files=[self.extracted_title_page_file],
+                )
+
+        biblatex_stage = "biblatex"
+        biblatex_stage_inputs = {
+            "references": json.dumps(self.settings.references),
+            "pandoc": _get_pandoc_version(),
+        }
+
+        if build_manifest.is_stage_up_to_date(
+            biblatex_stage,
+            inputs=biblatex_stage_inputs,
+            output_files=[self.generated_biblatex_file],
+        ):
+            rich.print("[bold yellow]Skipping BibLaTeX generation (up to date)")
+        else:
+            rich.print("[bold yellow]Generating BibLaTeX from metadata")
+            with profile("Generate BibLaTeX"):
+                self._generate_biblatex_file()
+            build_manifest.record_stage(
+                biblatex_stage,
+                inputs=biblatex_stage_inputs,
+                dependency_files=[],
+                output_files=[self.generated_biblatex_file],
+            )
+
+        metadata = self._make_metadata()
+        metadata_json = json.dumps(metadata, default=str)
+
+        md_to_tex_stage = "md-to-tex:" + input_file.name
+        md_to_tex_stage_inputs = {
+            "md": json.dumps(
+                [build_manifest.hash_file(md_file) for md_file in md_files]
+            ),
+            "metadata": metadata_json,
+            "template": build_manifest.hash_file(self.style.template_file),
+            "filters": json.dumps(
+                {
+                    str(lua_filter_file): build_manifest.hash_file(lua_filter_file)
+                    for lua_filter_file in sorted(
+                        self.pandoc_lua_filters_dir.glob("*.lua")
+                    )
+                }
+            ),
+            "pandoc": _get_pandoc_version(),
+            "pygments": (
+                _get_pygments_version()
+                if self.settings.code_highlighting == "pygments"
+                else None
+            ),
+            "pandoc_options": json.dumps(
+                [
+                    self._make_markdown_pandoc_input_format(),
+                    *self._make_markdown_pandoc_reader_options(),
+                    *self._make_latex_pandoc_writer_options(),
+                ]
+            ),
+        }
+
+        md_to_tex_stage_output_files = [output_tex_file]
 
-        rich.print("[bold yellow]Generating BibLaTeX from metadata")
-        self._generate_biblatex_file()
+        if self.settings.code_highlighting == "pygments":
+            md_to_tex_stage_output_files.append(self.pygments_style_defs_file)
+
+        if build_manifest.is_stage_up_to_date(
+            md_to_tex_stage,
+            inputs=md_to_tex_stage_inputs,
+            output_files=md_to_tex_stage_output_files,
+        ):
+            rich.print("[bold yellow]Skipping Pandoc (up to date)")
+            return output_tex_file
 
         rich.print("[bold yellow]Generating Pandoc JSON from metadata")
-        self._generate_metadata_json_file(output_metadata_json_file=metadata_json_file)
+        with profile("Generate metadata JSON"):
+            metadata_meta_json = self._make_metadata_meta_json(
+                metadata, cache_key=make_cache_key(metadata_json)
+            )
 
         try:
+            content_doc, block_md_file_indices = self._make_content_doc(md_files)
+        except subprocess.CalledProcessError as e:
+            rich.print("[bold red]Running Pandoc (Markdown to JSON) failed")
+            raise typer.Exit(1)
+
+        if self.settings.keep_pandoc_json_files:
+            rich.print("[bold yellow]Saving Pandoc JSONs")
+            with open(metadata_json_file, "w") as f:
+                write_doc(
+                    {**content_doc, "meta": {}, "blocks": []},
+                    f,
+                    extra_meta_json=metadata_meta_json,
+                )
+            with open(content_json_file, "w") as f:
+                json.dump(content_doc, f, ensure_ascii=False)
+
+        # NOTE: The content is validated before media is extracted, so problems
+        # with images are reported with the paths from the source files.
+        self._validate_content_doc(
+            content_doc,
+            block_source_files=[
+                (source_files or md_files)[i] for i in block_md_file_indices
+            ],
+        )
+
+        # NOTE: The dependencies are collected before media is extracted, so the
+        # source images are recorded instead of their copies in the work directory.
+        content_dependency_files = get_dependency_files(content_doc)
+
+        with profile("Extract media"):
+            self._extract_media(content_doc, build_manifest=build_manifest)
+
+        # WTF: The tables are '\input' by their paths, which are checked the same
+        # way as the paths in '_make_metadata'.
+        data_tables_dir = self.data_tables_dir.relative_to(Path.cwd()).as_posix()
+
+        if not re.match(r"^[A-Za-z0-9._\-\/]+$", data_tables_dir):
             rich.print(
-                "[bold yellow]Running Pandoc to generate Pandoc JSON from content"
+                f"[bold red]Error: [/bold red]Failed to provide a valid value for the '\\input' command that includes data tables",
+                file=sys.stderr,
             )
-            self._run_pandoc_from_md_to_json(
-                input_md_file=input_file,
-                output_content_json_file=content_json_file,
+            raise typer.Exit(1)
+
+        try:
+            with profile("Render data tables"):
+                data_table_files = DataTableRenderer(
+                    output_dir=self.data_tables_dir
+                ).render_doc(content_doc)
+        except (OSError, ValueError, csv.Error) as e:
+            rich.print(
+                f"[bold red]Error: [/bold red]Failed to read a data table: {e}",
+                file=sys.stderr,
             )
-        except subprocess.CalledProcessError as e:
-            rich.print("[bold red]Running Pandoc (Markdown to JSON) failed")
             raise typer.Exit(1)
 
+        # NOTE: The tables are rendered to the work directory, so they are
+        # recorded as dependencies to rebuild them if they are removed.
+        content_dependency_files.extend(data_table_files)
+
+        with profile("Include code"):
+            included_count = CodeIncluder().include_doc(content_doc)
+
+        if included_count:
+            rich.print(f"[bold yellow]Included {included_count} code blocks from files")
+
+        svg_to_pdf_image_converter = SVGToPDFImageConverter(
+            cache_dir=self.settings.cache_dir,
+            rsvg_convert_executable=self.settings.rsvg_convert_executable,
+        )
+        uncached_svg_images = svg_to_pdf_image_converter.get_uncached_images(
+            content_doc
+        )
+
+        if uncached_svg_images:
+            try:
+                rich.print(
+                    f"[bold yellow]Converting {len(uncached_svg_images)} SVG images to PDF"
+                )
+                with profile("Convert SVG images"):
+                    svg_to_pdf_image_converter.convert_images(uncached_svg_images)
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                rich.print("[bold red]Converting SVG images to PDF failed")
+                raise typer.Exit(1)
+
+        svg_to_pdf_image_converter.replace_svg_image_srcs(content_doc)
+
+        # NOTE: Draft builds don't include images at all.
+        if self.settings.raster_image_dpi is not None and not self.settings.draft:
+            self._optimize_raster_images(
+                content_doc, dpi=self.settings.raster_image_dpi
+            )
+
+        if self.settings.code_highlighting == "pygments":
+            from scholar.highlighting import CodeHighlighter
+
+            code_highlighter = CodeHighlighter(cache_dir=self.highlighting_cache_dir)
+            with profile("Highlight code"):
+                code_highlighter.highlight_doc(content_doc)
+                code_highlighter.write_style_defs_file(self.pygments_style_defs_file)
+
+        # NOTE: Metadata wins in case of duplicate keys.
+        for key in metadata:
+            content_doc["meta"].pop(key, None)
+
         try:
             rich.print(
                 "[bold yellow]Running Pandoc to generate LaTeX from Pandoc JSONs"
             )
-            self._run_pandoc_from_jsons_to_tex(
-                input_metadata_json_file=metadata_json_file,
-                input_content_json_file=content_json_file,
-                output_tex_file=output_tex_file,
-            )
+            with profile("Pandoc: JSON to LaTeX", category="pandoc"):
+                self._run_pandoc_from_json_to_tex(
+                    input_doc=content_doc,
+                    metadata_meta_json=metadata_meta_json,
+                    output_tex_file=output_tex_file,
+                )
         except subprocess.CalledProcessError as e:
             rich.print("[bold red]Running Pandoc (JSONs to LaTeX) failed")
             raise typer.Exit(1)
 
+        build_manifest.record_stage(
+            md_to_tex_stage,
+            inputs=md_to_tex_stage_inputs,
+            dependency_files=content_dependency_files,
+            output_files=md_to_tex_stage_output_files,
+        )
+
         return output_tex_file
 
+    def get_dependency_files(self, input_file: Path) -> list[Path]:
+        build_manifest = BuildManifest(self.build_manifest_file)
+        return build_manifest.get_stage_dependency_files("md-to-tex:" + input_file.name)
+
+    def _validate_content_doc(
+        self, content_doc: dict[str, Any], *, block_source_files: list[Path]
+    ) -> None:
+        # NOTE: Broken references, citations, includes and images are reported
+        # before Pandoc and LaTeX spend minutes on the document.
+        with profile("Validate content"):
+            problems = ContentValidator(
+                references=self.settings.references
+            ).validate_doc(content_doc, block_source_files=block_source_files)
+
+        if problems:
+            for problem in problems:
+                rich.print(
+                    f"[bold red]Error: [/bold red]{escape(str(problem))}",
+                    file=sys.stderr,
+                )
+            raise typer.Exit(1)
+
+    def _optimize_raster_images(self, content_doc: dict[str, Any], *, dpi: int) -> None:
+        if not RasterImageOptimizer.is_available():
+            rich.print(
+                "[bold yellow]Warning: [/bold yellow]Pillow is not installed, raster "
+                "images are left as they are",
+            )
+            return
+
+        raster_image_optimizer = RasterImageOptimizer(
+            cache_dir=self.settings.cache_dir, dpi=dpi
+        )
+        uncached_raster_images = raster_image_optimizer.get_uncached_images(content_doc)
+
+        if uncached_raster_images:
+            try:
+                rich.print(
+                    f"[bold yellow]Optimizing {len(uncached_raster_images)} raster images"
+                )
+                with profile("Optimize raster images"):
+                    raster_image_optimizer.optimize_images(uncached_raster_images)
+            except (OSError, ValueError) as e:
+                rich.print(
+                    f"[bold red]Error: [/bold red]Optimizing raster images failed: {e}",
+                    file=sys.stderr,
+                )
+                raise typer.Exit(1)
+
+        raster_image_optimizer.replace_raster_image_srcs(content_doc)
+
     def _make_markdown_pandoc_input_format(self) -> str:
         return _make_pandoc_format(
             "commonmark",
@@ -131,71 +446,27 @@ class MarkdownToLaTeXConverter(Converter):
         return _make_pandoc_format("latex")
 
     def _make_markdown_pandoc_reader_options(self) -> list[str]:
+        # NOTE: Media isn't extracted by Pandoc ('--extract-media') because the
+        # Pandoc JSON is cached and Pandoc doesn't run on a cache hit, see
+        # '_extract_media'.
         return [
             "--shift-heading-level-by",
             "-1",
-            "--extract-media",
-            str(self.pandoc_extracted_resources_dir),
         ]
 
-    def _make_latex_pandoc_writer_filter_options(self) -> list[str]:
-        pandoc_filters = [
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_table.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_image.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_math.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "include_code_block.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "trim_code_block.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_code_block.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_code.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_link_reference.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_link_citation.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_div_list_of_references.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "render_div_table_of_contents.lua",
-                PandocFilterType.LUA,
-            ),
-            PandocFilter(
-                self.pandoc_lua_filters_dir / "make_and_render_sections.lua",
-                PandocFilterType.LUA,
-            ),
+    def _make_latex_pandoc_writer_filters(self) -> list[PandocFilter]:
+        # NOTE: This filter runs the rest of the Lua filters from the same
+        # directory in as few document traversals as possible.
+        return [
             PandocFilter(
-                self.pandoc_lua_filters_dir / "convert_image_from_svg_to_pdf.lua",
+                self.pandoc_lua_filters_dir / "run_scholar_filters.lua",
                 PandocFilterType.LUA,
             ),
         ]
 
+    def _make_latex_pandoc_writer_filter_options(self) -> list[str]:
         pandoc_filter_options = []
-        for pandoc_filter in pandoc_filters:
+        for pandoc_filter in self._make_latex_pandoc_writer_filters():
             if pandoc_filter.filter_type == PandocFilterType.LUA:
                 pandoc_filter_options.extend(
                     ["--lua-filter", str(pandoc_filter.filter_program)]
@@ -241,19 +512,143 @@ class MarkdownToLaTeXConverter(Converter):
             )
             raise typer.Exit(1)
 
+    def _convert_strings_from_md_to_tex_using_pandoc(
+        self, *, input_md_strings: list[str]
+    ) -> list[str]:
+        # NOTE: Each string must be converted exactly as if it was converted on its
+        # own, so the strings that could affect the others in a single Pandoc run
+        # are converted on their own.
+        batched_indices = [
+            i
+            for i, input_md_string in enumerate(input_md_strings)
+            if _can_convert_md_string_in_batch(input_md_string)
+        ]
+
+        raw_output_tex_strings = [
+            ""
+            if _can_convert_md_string_in_batch(input_md_string)
+            else self._convert_string_from_md_to_tex_using_pandoc(
+                input_md_string=input_md_string
+            )
+            for input_md_string in input_md_strings
+        ]
+
+        for i, raw_output_tex_string in zip(
+            batched_indices,
+            self._convert_batch_of_strings_from_md_to_tex_using_pandoc(
+                input_md_strings=[input_md_strings[i] for i in batched_indices]
+            ),
+        ):
+            raw_output_tex_strings[i] = raw_output_tex_string
+
+        # WTF: Pandoc can add extra whitespace to the the output string even if the
+        # input string doesn't have it (particularly at the end of the string).
+        return [
+            raw_output_tex_string.strip()
+            for raw_output_tex_string in raw_output_tex_strings
+        ]
+
+    def _convert_batch_of_strings_from_md_to_tex_using_pandoc(
+        self, *, input_md_strings: list[str]
+    ) -> list[str]:
+        if not input_md_strings:
+            return []
+
+        # NOTE: The strings are converted in a single Pandoc run, separated by a
+        # paragraph that consists of alphanumeric characters only so that no
+        # Markdown extension (e.g. 'smart') can alter it on the way to LaTeX.
+        separator = "scholarseparator" + uuid.uuid4().hex
+
+        raw_output_tex_string = self._convert_string_from_md_to_tex_using_pandoc(
+            input_md_string=("\n\n" + separator + "\n\n").join(input_md_strings)
+        )
+        raw_output_tex_strings = re.split(
+            "^" + separator + "$", raw_output_tex_string, flags=re.MULTILINE
+        )
+
+        # WTF: A string can leak into the next one if it has an unclosed block
+        # (e.g. a fenced code block), swallowing the separator. We can't split the
+        # output reliably in this case, so we convert the strings one by one.
+        if len(raw_output_tex_strings) != len(input_md_strings):
+            rich.print(
+                "[bold yellow]Warning: [/bold yellow]Failed to convert Markdown strings to LaTeX in a single Pandoc run, converting them one by one",
+                file=sys.stderr,
+            )
+            raw_output_tex_strings = [
+                self._convert_string_from_md_to_tex_using_pandoc(
+                    input_md_string=input_md_string
+                )
+                for input_md_string in input_md_strings
+            ]
+
+        return raw_output_tex_strings
+
+    def _convert_references_from_md_to_tex(
+        self, *, reference_texts_md: list[str]
+    ) -> list[str]:
+        references_cache = ContentAddressedCache(
+            self.references_cache_dir, suffix=".tex"
+        )
+
+        # NOTE: The LaTeX of a reference only depends on its own Markdown because
+        # the references that could affect others are converted on their own (see
+        # '_can_convert_md_string_in_batch'). The version marks the entries that
+        # were cached before that and may depend on other references.
+        cache_keys = [
+            make_cache_key(
+                REFERENCES_CACHE_VERSION,
+                _get_pandoc_version(),
+                self._make_markdown_pandoc_input_format(),
+                self._make_latex_pandoc_output_format(),
+                *self._make_markdown_pandoc_reader_options(),
+                *self._make_latex_pandoc_writer_options(),
+                reference_text_md,
+            )
+            for reference_text_md in reference_texts_md
+        ]
+
+        reference_texts_tex: list[str | None] = []
+        uncached_indices = []
+
+        for i, cache_key in enumerate(cache_keys):
+            cached_reference_text_tex = references_cache.get(cache_key)
+
+            if cached_reference_text_tex is None:
+                uncached_indices.append(i)
+                reference_texts_tex.append(None)
+            else:
+                reference_texts_tex.append(cached_reference_text_tex.decode())
+
+        converted_reference_texts_tex = (
+            self._convert_strings_from_md_to_tex_using_pandoc(
+                input_md_strings=[reference_texts_md[i] for i in uncached_indices]
+            )
+        )
+
+        for i, reference_text_tex in zip(
+            uncached_indices, converted_reference_texts_tex
+        ):
+            references_cache.put(cache_keys[i], reference_text_tex.encode())
+            reference_texts_tex[i] = reference_text_tex
+
+        return [
+            reference_text_tex
+            for reference_text_tex in reference_texts_tex
+            if reference_text_tex is not None
+        ]
+
     def _generate_biblatex_file(self) -> None:
         biblatex_file_content = ""
 
         is_first_reference = True
 
-        for reference_id, reference_text_md in self.settings.references.items():
-            raw_reference_text_tex = self._convert_string_from_md_to_tex_using_pandoc(
-                input_md_string=reference_text_md
-            )
-            # WTF: Pandoc can add extra whitespace to the the output string even if the
-            # input string doesn't have it (particularly at the end of the string).
-            reference_text_tex = raw_reference_text_tex.strip()
+        reference_texts_tex = self._convert_references_from_md_to_tex(
+            reference_texts_md=list(self.settings.references.values())
+        )
 
+        for reference_id, reference_text_tex in zip(
+            self.settings.references, reference_texts_tex
+        ):
             if not is_first_reference:
                 biblatex_file_content += "\n"
 
@@ -262,10 +657,13 @@ class MarkdownToLaTeXConverter(Converter):
             biblatex_file_content += "    text = {" + reference_text_tex + "}\n"
             biblatex_file_content += "}\n"
 
-        with open(self.generated_biblatex_file, "w") as f:
-            f.write(biblatex_file_content)
+        # NOTE: The file is left untouched if its content hasn't changed so that
+        # latexmk doesn't rerun the bibliography backend because of a new mtime.
+        write_file_if_changed(
+            self.generated_biblatex_file, biblatex_file_content.encode()
+        )
 
-    def _generate_metadata_json_file(self, *, output_metadata_json_file: Path) -> None:
+    def _make_metadata(self) -> dict[str, Any]:
         # WTF: At the time of writting this the value of this variable is supposed to
         # always pass the regular expression check below because it points to a
         # directory the path elements of which are pre-defined in Scholar's
@@ -289,6 +687,14 @@ class MarkdownToLaTeXConverter(Converter):
         else:
             includepdf_title_page = None
 
+        # WTF: Same for the Pygments style definitions file.
+        if self.settings.code_highlighting == "pygments":
+            input_pygments_style_defs = self.pygments_style_defs_file.relative_to(
+                Path.cwd()
+            ).as_posix()
+        else:
+            input_pygments_style_defs = None
+
         pattern = re.compile(r"^[A-Za-z0-9._\-\/]+$")
 
         if not pattern.match(minted_outputdir):
@@ -313,30 +719,166 @@ class MarkdownToLaTeXConverter(Converter):
                 )
                 typer.Exit(1)
 
-        metadata = _value_to_metavalue(
-            {
-                "scholar": {
-                    "settings": self.settings.dict(),
-                    "constants": {
-                        "biblatex_bibresource": biblatex_bibresource,
-                        "includepdf_title_page": includepdf_title_page,
-                        "minted_outputdir": minted_outputdir,
-                    },
-                    "variables": self.style.variables,
+        if input_pygments_style_defs and not pattern.match(input_pygments_style_defs):
+            rich.print(
+                f"[bold red]Error: [/bold red]Failed to provide a valid value for the '\\input' command that includes Pygments style definitions",
+                file=sys.stderr,
+            )
+            typer.Exit(1)
+
+        return {
+            "scholar": {
+                "settings": self.settings.dict(),
+                "constants": {
+                    "biblatex_bibresource": biblatex_bibresource,
+                    "includepdf_title_page": includepdf_title_page,
+                    "minted_outputdir": minted_outputdir,
+                    "input_pygments_style_defs": input_pygments_style_defs,
+                    # NOTE: Draft builds render code that Scholar hasn't
+                    # highlighted as plain verbatim text instead of running
+                    # 'minted'.
+                    "use_minted": (
+                        self.settings.code_highlighting == "minted"
+                        and not self.settings.draft
+                    ),
                 },
-            }
-        )
+                "variables": self.style.variables,
+            },
+        }
+
+    def _make_metadata_meta_json(
+        self, metadata: dict[str, Any], *, cache_key: str
+    ) -> str:
+        # NOTE: The metadata only changes with the settings, so its Pandoc JSON is
+        # cached by their hash and it isn't regenerated when only the content of
+        # the document changes.
+        cache = ContentAddressedCache(self.metadata_json_cache_dir, suffix=".json")
+
+        if (cached_meta_json := cache.get(cache_key)) is not None:
+            return cached_meta_json.decode()
+
+        f = io.StringIO()
+        write_meta(metadata, f)
+        meta_json = f.getvalue()
+
+        cache.put(cache_key, meta_json.encode())
+        return meta_json
+
+    def _make_content_doc(
+        self, md_files: list[Path]
+    ) -> tuple[dict[str, Any], list[int]]:
+        # NOTE: The Pandoc JSON of each file is cached by the content of the file,
+        # so only the files that have changed since they were last parsed are
+        # parsed again (in parallel, each by its own Pandoc process). Returns the
+        # document and the index of the file of each of its blocks.
+        cache = ContentAddressedCache(self.pandoc_json_cache_dir, suffix=".json")
+        cache_keys = [
+            make_cache_key(
+                md_file.read_bytes(),
+                _get_pandoc_version(),
+                self._make_markdown_pandoc_input_format(),
+                *self._make_markdown_pandoc_reader_options(),
+            )
+            for md_file in md_files
+        ]
+
+        docs_json = [cache.get(cache_key) for cache_key in cache_keys]
+        uncached_indices = [
+            i for i, doc_json in enumerate(docs_json) if doc_json is None
+        ]
+
+        if not uncached_indices:
+            rich.print("[bold yellow]Skipping Pandoc (Markdown to JSON) (cached)")
+        else:
+            if len(md_files) == 1:
+                rich.print(
+                    "[bold yellow]Running Pandoc to generate Pandoc JSON from content"
+                )
+            else:
+                rich.print(
+                    "[bold yellow]Running Pandoc to generate Pandoc JSON from content "
+                    + f"({len(uncached_indices)} of {len(md_files)} files)"
+                )
+
+            with profile(
+                "Pandoc: Markdown to JSON", category="pandoc"
+            ), ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                for i, doc_json in zip(
+                    uncached_indices,
+                    executor.map(
+                        lambda i: self._run_pandoc_from_md_to_json(
+                            input_md_file=md_files[i]
+                        ),
+                        uncached_indices,
+                    ),
+                ):
+                    cache.put(cache_keys[i], doc_json)
+                    docs_json[i] = doc_json
+
+        docs: list[dict[str, Any]] = [
+            json.loads(doc_json) for doc_json in docs_json if doc_json is not None
+        ]
+        content_doc = docs[0]
+        block_md_file_indices = [0] * len(content_doc["blocks"])
+
+        for i, doc in enumerate(docs[1:], start=1):
+            content_doc["meta"].update(doc["meta"])
+            content_doc["blocks"].extend(doc["blocks"])
+            block_md_file_indices.extend([i] * len(doc["blocks"]))
 
-        with open(output_metadata_json_file, "w") as f:
-            json.dump(panflute.Doc(metadata=metadata).to_json(), f, ensure_ascii=False)
+        return content_doc, block_md_file_indices
 
-    def _run_pandoc_from_md_to_json(
-        self, *, input_md_file: Path, output_content_json_file: Path
+    def _extract_media(
+        self, content_doc: dict[str, Any], *, build_manifest: BuildManifest
     ) -> None:
+        # NOTE: This does what '--extract-media' would do: local images are copied
+        # to the work directory, under their relative paths (or under the hash of
+        # their paths if they are absolute or outside the current directory), and
+        # pointed to there. It runs on every build and only copies the images
+        # that have changed, so edited images are picked up and LaTeX doesn't
+        # see new mtimes for the rest.
+        for image in iter_elements(content_doc, "Image"):
+            src = get_image_src(image)
+
+            # NOTE: Remote and data URI images are reported by
+            # '_validate_content_doc'.
+            if "://" in src or src.startswith("data:"):
+                continue
+
+            source_file = Path(src)
+
+            # NOTE: Missing images are reported by '_validate_content_doc'.
+            if not source_file.is_file():
+                continue
+
+            if not source_file.is_absolute() and ".." not in source_file.parts:
+                extracted_file = self.pandoc_extracted_resources_dir / source_file
+            else:
+                extracted_file = self.pandoc_extracted_resources_dir / (
+                    hashlib.sha1(src.encode()).hexdigest() + source_file.suffix
+                )
+
+            # NOTE: The hashes come from the manifest's stat-keyed index, so
+            # unchanged images and their copies aren't read again.
+            if build_manifest.hash_file(extracted_file) != build_manifest.hash_file(
+                source_file
+            ):
+                extracted_file.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = make_temp_file(extracted_file)
+
+                try:
+                    shutil.copyfile(source_file, temp_file)
+                    os.replace(temp_file, extracted_file)
+                finally:
+                    temp_file.unlink(missing_ok=True)
+
+            set_image_src(image, str(extracted_file))
+
+    def _run_pandoc_from_md_to_json(self, *, input_md_file: Path) -> bytes:
         markdown_pandoc_input_format = self._make_markdown_pandoc_input_format()
         json_pandoc_output_format = "json"
 
-        subprocess.run(
+        completed_process = subprocess.run(
             [
                 "pandoc",
                 # Format options
@@ -347,91 +889,480 @@ class MarkdownToLaTeXConverter(Converter):
                 # Reader options
                 *self._make_markdown_pandoc_reader_options(),
                 # I/O options
-                "--output",
-                str(output_content_json_file),
                 str(input_md_file),
             ],
-            stdout=sys.stdout,
+            stdout=subprocess.PIPE,
             stderr=sys.stderr,
             check=True,
         )
 
-    def _run_pandoc_from_jsons_to_tex(
+        return completed_process.stdout
+
+    def _run_pandoc_from_json_to_tex(
         self,
         *,
-        input_metadata_json_file: Path,
-        input_content_json_file: Path,
+        input_doc: dict[str, Any],
+        metadata_meta_json: str,
         output_tex_file: Path,
     ) -> None:
         json_pandoc_input_format = "json"
         latex_pandoc_output_format = self._make_latex_pandoc_output_format()
 
-        subprocess.run(
-            [
-                "pandoc",
-                # Format options
-                "--from",
-                json_pandoc_input_format,
-                "--to",
-                latex_pandoc_output_format,
-                # Template options
-                "--standalone",
-                "--template",
-                str(self.style.template_file),
-                # Writer options
-                *self._make_latex_pandoc_writer_options(),
-                *self._make_latex_pandoc_writer_filter_options(),
-                # I/O options
-                "--output",
-                str(output_tex_file),
-                # NOTE: Last input argument wins in case of duplicate keys.
-                str(input_content_json_file),
-                str(input_metadata_json_file),
-            ],
-            stdout=sys.stdout,
-            stderr=sys.stderr,
-            check=True,
+        args = [
+            "pandoc",
+            # Format options
+            "--from",
+            json_pandoc_input_format,
+            "--to",
+            latex_pandoc_output_format,
+            # Template options
+            "--standalone",
+            "--template",
+            str(self.style.template_file),
+            # Writer options
+            *self._make_latex_pandoc_writer_options(),
+            *self._make_latex_pandoc_writer_filter_options(),
+            # I/O options
+            "--output",
+            str(output_tex_file),
+        ]
+
+        # NOTE: When the build is profiled, 'run_scholar_filters.lua' reports how
+        # long each of the Lua filters took.
+        profiler = get_profiler()
+        lua_filter_times_file = self.pandoc_output_dir / "lua-filter-times.json"
+        env = None
+
+        if profiler is not None:
+            lua_filter_times_file.unlink(missing_ok=True)
+            env = {
+                **os.environ,
+                LUA_FILTER_TIMES_FILE_ENV_VAR: str(lua_filter_times_file),
+            }
+
+        start_time_ns = time.time_ns()
+        process = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=sys.stdout, stderr=sys.stderr, env=env
         )
+        assert process.stdin is not None
+
+        # NOTE: The document is streamed to Pandoc in chunks as it is being
+        # serialized instead of being serialized to a string first. The metadata
+        # is already serialized and is written as it is.
+        stdin = io.TextIOWrapper(process.stdin, encoding="utf-8")
+        try:
+            write_doc(input_doc, stdin, extra_meta_json=metadata_meta_json)
+            stdin.close()
+        except BrokenPipeError:
+            # NOTE: Pandoc has exited early, its exit code will tell us why.
+            with contextlib.suppress(BrokenPipeError):
+                stdin.close()
+
+        returncode = process.wait()
+
+        if profiler is not None:
+            profiler.add_lua_filter_spans(
+                lua_filter_times_file, start_time_ns=start_time_ns, pid=process.pid
+            )
+
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, args)
 
 
 class LaTeXToPDFConverter(Converter):
-    def __init__(self, *, latexmk_output_dir: Path, settings: Settings) -> None:
+    def __init__(
+        self,
+        *,
+        latexmk_output_dir: Path,
+        optimized_pdf_output_dir: Path,
+        latex_formats_dir: Path,
+        split_tex_dir: Path,
+        generated_biblatex_file: Path,
+        build_manifest_file: Path,
+        settings: Settings,
+    ) -> None:
         self.latexmk_output_dir = latexmk_output_dir
+        self.optimized_pdf_output_dir = optimized_pdf_output_dir
+        self.latex_formats_dir = latex_formats_dir
+        self.split_tex_dir = split_tex_dir
+        self.generated_biblatex_file = generated_biblatex_file
+        self.build_manifest_file = build_manifest_file
         self.settings = settings
 
     def convert(self, input_file: Path) -> Path:
+        output_pdf_file = self._run_latex_program(input_file)
+
+        # NOTE: Draft builds are meant to be fast, not small.
+        if self.settings.optimize_pdf and not self.settings.draft:
+            return self._optimize_pdf(output_pdf_file)
+
+        return output_pdf_file
+
+    def get_dependency_files(self, input_file: Path) -> list[Path]:
+        build_manifest = BuildManifest(self.build_manifest_file)
+        return build_manifest.get_stage_dependency_files("latexmk:" + input_file.name)
+
+    def _run_latex_program(self, input_file: Path) -> Path:
+        output_pdf_file = self.latexmk_output_dir / input_file.with_suffix(".pdf").name
+        recorder_file = self.latexmk_output_dir / input_file.with_suffix(".fls").name
+
+        build_manifest = BuildManifest(self.build_manifest_file)
+
+        # NOTE: The format file's name is derived from the preamble it contains, so
+        # it ends up in the latexmk options below and a rebuilt format reruns
+        # latexmk.
+        format_file = (
+            LaTeXFormatBuilder(formats_dir=self.latex_formats_dir).get_format_file(
+                input_file
+            )
+            if self.settings.precompile_preamble
+            else None
+        )
+
+        split_latex_file_ = self._split_latex_file(input_file)
+        latex_input_file = (
+            split_latex_file_.tex_file if split_latex_file_ is not None else input_file
+        )
+
+        # NOTE: Draft builds run a single XeLaTeX pass instead of latexmk, which
+        # reruns XeLaTeX and BibTeX until the output stops changing. The pass reuses
+        # the auxiliary files of the previous build (e.g. the bibliography), so
+        # only new references and citations come out unresolved.
+        if self.settings.draft:
+            latex_program = "XeLaTeX (draft)"
+            latex_args = self._make_xelatex_args(
+                latex_input_file,
+                self.latexmk_output_dir,
+                shell_escape=self._needs_shell_escape(),
+                format_file=format_file,
+            )
+        else:
+            latex_program = "latexmk"
+            latex_args = self._make_latexmk_args(
+                latex_input_file,
+                self.latexmk_output_dir,
+                shell_escape=self._needs_shell_escape(),
+                format_file=format_file,
+            )
+
+        latexmk_stage = "latexmk:" + input_file.name
+        # NOTE: The bibliography is read by BibTeX, not XeLaTeX, so it isn't in
+        # the '.fls' file that the dependency files are read from.
+        latexmk_stage_inputs = {
+            "tex": build_manifest.hash_file(input_file),
+            "bib": build_manifest.hash_file(self.generated_biblatex_file),
+            "latexmk_options": json.dumps(latex_args),
+            "tex_skeleton": (
+                split_latex_file_.get_skeleton_hash()
+                if split_latex_file_ is not None
+                else None
+            ),
+            "tex_sections": (
+                json.dumps(split_latex_file_.get_section_hashes())
+                if split_latex_file_ is not None
+                else None
+            ),
+        }
+
+        if build_manifest.is_stage_up_to_date(
+            latexmk_stage,
+            inputs=latexmk_stage_inputs,
+            output_files=[output_pdf_file],
+        ):
+            rich.print(f"[bold yellow]Skipping {latex_program} (up to date)")
+            return output_pdf_file
+
+        if split_latex_file_ is not None:
+            changed_sections = self._get_changed_sections(
+                build_manifest.get_stage_inputs(latexmk_stage), latexmk_stage_inputs
+            )
+
+            if changed_sections is not None:
+                rich.print(
+                    f"[bold yellow]Recompiling {len(changed_sections)} of "
+                    f"{len(split_latex_file_.sections)} sections"
+                )
+
+            split_latex_file_.write(
+                output_dir=self.latexmk_output_dir, include_only=changed_sections
+            )
+
         try:
-            rich.print("[bold yellow]Running latexmk")
-            self._run_latexmk(input_file, self.latexmk_output_dir)
+            rich.print(f"[bold yellow]Running {latex_program}")
+            with profile(latex_program, category="latex"):
+                self._run_latex(latex_args)
         except subprocess.CalledProcessError as e:
-            rich.print("[bold red]Running latexmk failed")
+            rich.print(f"[bold red]Running {latex_program} failed")
+            raise typer.Exit(1)
+
+        build_manifest.record_stage(
+            latexmk_stage,
+            inputs=latexmk_stage_inputs,
+            dependency_files=self._read_recorded_input_files(
+                recorder_file, self.latexmk_output_dir
+            ),
+            output_files=[output_pdf_file],
+        )
+
+        return output_pdf_file
+
+    def _optimize_pdf(self, input_pdf_file: Path) -> Path:
+        pdf_optimizer = PDFOptimizer(qpdf_executable=self.settings.qpdf_executable)
+
+        if (backend_version := pdf_optimizer.get_backend_version()) is None:
+            rich.print(
+                "[bold yellow]Warning: [/bold yellow]Neither pikepdf nor qpdf is "
+                "installed, the PDF is left as it is",
+            )
+            return input_pdf_file
+
+        # NOTE: The optimized PDF has the same name as the one from LaTeX, so it
+        # lives in a directory of its own.
+        output_pdf_file = self.optimized_pdf_output_dir / input_pdf_file.name
+
+        build_manifest = BuildManifest(self.build_manifest_file)
+        pdf_optimization_stage = "pdf-optimization:" + input_pdf_file.name
+        pdf_optimization_stage_inputs = {
+            "pdf": build_manifest.hash_file(input_pdf_file),
+            "backend": backend_version,
+        }
+
+        if build_manifest.is_stage_up_to_date(
+            pdf_optimization_stage,
+            inputs=pdf_optimization_stage_inputs,
+            output_files=[output_pdf_file],
+        ):
+            rich.print("[bold yellow]Skipping PDF optimization (up to date)")
+            return output_pdf_file
+
+        try:
+            rich.print("[bold yellow]Optimizing PDF")
+            with profile("Optimize PDF"):
+                pdf_optimizer.optimize(input_pdf_file, output_pdf_file)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            rich.print(
+                f"[bold red]Error: [/bold red]Optimizing PDF failed: {e}",
+                file=sys.stderr,
+            )
             raise typer.Exit(1)
 
-        return self.latexmk_output_dir / input_file.with_suffix(".pdf").name
+        build_manifest.record_stage(
+            pdf_optimization_stage,
+            inputs=pdf_optimization_stage_inputs,
+            dependency_files=[],
+            output_files=[output_pdf_file],
+        )
+
+        return output_pdf_file
+
+    def _split_latex_file(self, input_file: Path) -> SplitLaTeXFile | None:
+        # NOTE: The PDF of a build that recompiles only some of the sections
+        # ('\includeonly') lacks the other ones, which is fine for a preview but not
+        # for the final output, so only draft builds are split.
+        if not self.settings.split_sections or not self.settings.draft:
+            return None
+
+        # WTF: '\include' always starts a new page, so the sections of styles that
+        # don't start them on a new page can't be included.
+        if get_style(self.settings).variables["disable_section_page_breaks"]:
+            rich.print(
+                "[bold yellow]Warning: [/bold yellow]The style doesn't start sections "
+                "on a new page, the document isn't split into sections",
+            )
+            return None
+
+        try:
+            return split_latex_file(input_file, split_tex_dir=self.split_tex_dir)
+        except ValueError as e:
+            rich.print(
+                f"[bold red]Error: [/bold red]Failed to split the document into sections: {e}",
+                file=sys.stderr,
+            )
+            raise typer.Exit(1)
 
     @staticmethod
-    def _run_latexmk(input_file: Path, output_dir: Path) -> None:
-        subprocess.run(
-            [
-                "latexmk",
-                # Pipeline options
-                "-xelatex",
-                "-bibtex",
-                # Interaction options
-                "-interaction=nonstopmode",
-                "-halt-on-error",
-                "-file-line-error",
-                "-quiet",
-                # Other options
-                "-shell-escape",  # Needed for 'minted', has security implications
-                # I/O options
-                "-output-directory=" + str(output_dir),
-                str(input_file),
-            ],
-            stdout=sys.stdout,
-            stderr=sys.stderr,
-            check=True,
+    def _get_changed_sections(
+        recorded_inputs: dict[str, str | None] | None,
+        inputs: dict[str, str | None],
+    ) -> list[int] | None:
+        # NOTE: Sections can only be recompiled on their own if everything around
+        # them is the same as in the last successful build, which has left the
+        # '.aux' files of the other sections behind. Otherwise (and if nothing
+        # seems to have changed, e.g. when the PDF was deleted) the whole document
+        # is recompiled.
+        if recorded_inputs is None:
+            return None
+
+        for key in ["bib", "latexmk_options", "tex_skeleton"]:
+            if recorded_inputs.get(key) != inputs[key]:
+                return None
+
+        recorded_section_hashes = json.loads(
+            recorded_inputs.get("tex_sections") or "[]"
         )
+        section_hashes = json.loads(inputs["tex_sections"] or "[]")
+
+        if len(recorded_section_hashes) != len(section_hashes):
+            return None
+
+        changed_sections = [
+            i
+            for i, (recorded_section_hash, section_hash) in enumerate(
+                zip(recorded_section_hashes, section_hashes)
+            )
+            if recorded_section_hash != section_hash
+        ]
+
+        if not changed_sections or len(changed_sections) == len(section_hashes):
+            return None
+
+        return changed_sections
+
+    def _needs_shell_escape(self) -> bool:
+        # NOTE: Only 'minted' needs it, code highlighted with Pygments ahead of
+        # time or not highlighted at all (in draft mode) doesn't.
+        return self.settings.code_highlighting == "minted" and not self.settings.draft
+
+    @staticmethod
+    def _make_latexmk_args(
+        input_file: Path,
+        output_dir: Path,
+        *,
+        shell_escape: bool,
+        format_file: Path | None = None,
+    ) -> list[str]:
+        return [
+            "latexmk",
+            # Pipeline options
+            (
+                "-xelatex=xelatex -fmt=" + shlex.quote(str(format_file)) + " %O %S"
+                if format_file is not None
+                else "-xelatex"
+            ),
+            "-bibtex",
+            # Interaction options
+            "-interaction=nonstopmode",
+            "-halt-on-error",
+            "-file-line-error",
+            "-quiet",
+            # Other options
+            *(
+                ["-shell-escape"]  # Needed for 'minted', has security implications
+                if shell_escape
+                else []
+            ),
+            "-recorder",  # Needed to find out which files LaTeX has read
+            # I/O options
+            "-output-directory=" + str(output_dir),
+            str(input_file),
+        ]
+
+    @staticmethod
+    def _make_xelatex_args(
+        input_file: Path,
+        output_dir: Path,
+        *,
+        shell_escape: bool,
+        format_file: Path | None = None,
+    ) -> list[str]:
+        return [
+            "xelatex",
+            *(["-fmt=" + str(format_file)] if format_file is not None else []),
+            # Interaction options
+            "-interaction=nonstopmode",
+            "-halt-on-error",
+            "-file-line-error",
+            # Other options
+            *(
+                ["-shell-escape"]  # Needed for 'minted', has security implications
+                if shell_escape
+                else []
+            ),
+            "-recorder",  # Needed to find out which files LaTeX has read
+            # I/O options
+            "-output-directory=" + str(output_dir),
+            str(input_file),
+        ]
+
+    @classmethod
+    def _run_latex(cls, args: list[str]) -> None:
+        profiler = get_profiler()
+
+        if profiler is None or args[0] != "latexmk":
+            subprocess.run(
+                args,
+                stdout=sys.stdout,
+                stderr=sys.stderr,
+                check=True,
+            )
+            return
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spans_file = Path(temp_dir) / "spans.jsonl"
+
+            try:
+                subprocess.run(
+                    cls._make_profiled_latexmk_args(args),
+                    stdout=sys.stdout,
+                    stderr=sys.stderr,
+                    env={**os.environ, SUBPROCESS_SPANS_FILE_ENV_VAR: str(spans_file)},
+                    check=True,
+                )
+            finally:
+                profiler.add_subprocess_spans(spans_file)
+
+    @staticmethod
+    def _make_profiled_latexmk_args(args: list[str]) -> list[str]:
+        # NOTE: latexmk runs XeLaTeX and BibTeX through a wrapper that records
+        # how long each run took. The wrapper isn't a part of the latexmk options
+        # recorded in the build manifest, so profiling doesn't invalidate builds.
+        wrapper = shlex.join([sys.executable, "-m", "scholar.profiling"])
+        profiled_args = []
+
+        for arg in args[:-1]:
+            if arg == "-xelatex":
+                arg = "-xelatex=xelatex %O %S"
+            if arg.startswith("-xelatex="):
+                arg = "-xelatex=" + wrapper + " " + arg.removeprefix("-xelatex=")
+            profiled_args.append(arg)
+
+        return [
+            *profiled_args,
+            "-e",
+            "$bibtex = q|" + wrapper + " bibtex %O %S|",
+            args[-1],
+        ]
+
+    @staticmethod
+    def _read_recorded_input_files(recorder_file: Path, output_dir: Path) -> list[Path]:
+        # NOTE: We only care about the files that belong to the document, i.e. the
+        # ones in the current working directory (LaTeX packages and fonts are
+        # system-wide) that aren't LaTeX's own auxiliary files.
+        cwd = Path.cwd()
+        resolved_output_dir = output_dir.resolve()
+
+        input_files = []
+
+        try:
+            with open(recorder_file) as f:
+                for line in f:
+                    if not line.startswith("INPUT "):
+                        continue
+
+                    input_file = (
+                        cwd / line.removeprefix("INPUT ").rstrip("\n")
+                    ).resolve()
+
+                    if not input_file.is_relative_to(cwd):
+                        continue
+                    if input_file.is_relative_to(resolved_output_dir):
+                        continue
+
+                    input_files.append(input_file)
+        except FileNotFoundError:
+            pass
+
+        return list(dict.fromkeys(input_files))
 
 
 def _make_pandoc_format(
@@ -450,16 +1381,41 @@ def _make_pandoc_format(
     return pandoc_format
 
 
-def _value_to_metavalue(value: Any) -> panflute.MetaValue:
-    if isinstance(value, dict):
-        return panflute.MetaMap(
-            **{k: _value_to_metavalue(v) for k, v in value.items() if v is not None}
+def _can_convert_md_string_in_batch(md_string: str) -> bool:
+    # WTF: Link reference definitions (e.g. '[x]: http://example.com') apply to
+    # the whole Markdown document they are in, and footnotes aren't enabled, so
+    # their definitions are link reference definitions too. An unclosed code fence
+    # turns everything after it into code, separators included, which can't be
+    # told apart from a successful split. The checks err on the side of
+    # converting too many strings on their own.
+    return "]:" not in md_string and "```" not in md_string and "~~~" not in md_string
+
+
+def _get_pygments_version() -> str:
+    # NOTE: Pygments is an optional dependency, like Pillow. It is only imported
+    # when code is highlighted with it.
+    try:
+        import pygments
+    except ImportError:
+        rich.print(
+            "[bold red]Error: [/bold red]Pygments is not installed, it is needed to highlight code with it",
+            file=sys.stderr,
         )
-    elif isinstance(value, list):
-        return panflute.MetaList(
-            *[_value_to_metavalue(v) for v in value if v is not None]
+        raise typer.Exit(1)
+
+    version: str = pygments.__version__
+    return version
+
+
+@functools.cache
+def _get_pandoc_version() -> str:
+    try:
+        pandoc_version_output = subprocess.check_output(
+            ["pandoc", "--version"], text=True
         )
-    elif isinstance(value, bool):
-        return panflute.MetaBool(value)
-    else:
-        return panflute.MetaString(str(value))
+    except subprocess.CalledProcessError as e:
+        rich.print("[bold red]Error: [/bold red]Failed to get Pandoc version.")
+        raise typer.Exit(1)
+
+    # NOTE: The first line looks like "pandoc 2.19.2".
+    return pandoc_version_output.splitlines()[0]
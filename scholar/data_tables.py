@@ -0,0 +1,158 @@
+import csv
+import os
+import re
+from pathlib import Path
+from typing import Any, TextIO
+
+import rich
+
+from scholar.caches import hash_file, make_cache_key, make_temp_file
+from scholar.pandoc_json import get_element_attributes, iter_elements
+
+# NOTE: Code blocks with this class and an 'include' attribute are tables read
+# from CSV (or TSV) files, e.g. '```{.table include="results.csv"}'.
+DATA_TABLE_CLASS = "table"
+
+# NOTE: The data tables are turned into Divs with this class that
+# 'render_table.lua' renders. These must match the names it uses.
+DATA_TABLE_DIV_CLASS = "data-table"
+DATA_TABLE_HEAD_LATEX_ATTRIBUTE = "head_latex"
+DATA_TABLE_BODY_FILE_ATTRIBUTE = "body_file"
+DATA_TABLE_COLUMNS_ATTRIBUTE = "columns"
+
+# NOTE: This must match 'INSIDE_HRULE_THICKNESS_IN_PT' in 'render_table.lua'.
+INSIDE_HRULE_LATEX = "\\specialrule{0.5000pt}{0pt}{0pt}"
+
+_LATEX_SPECIAL_CHARACTERS = {
+    "\\": "\\textbackslash{}",
+    "{": "\\{",
+    "}": "\\}",
+    "$": "\\$",
+    "&": "\\&",
+    "#": "\\#",
+    "_": "\\_",
+    "%": "\\%",
+    "~": "\\textasciitilde{}",
+    "^": "\\^{}",
+}
+_LATEX_SPECIAL_CHARACTERS_PATTERN = re.compile(
+    "|".join(re.escape(c) for c in _LATEX_SPECIAL_CHARACTERS)
+)
+
+
+class DataTableRenderer:
+    def __init__(self, *, output_dir: Path) -> None:
+        self.output_dir = output_dir
+
+    def render_doc(self, doc: dict[str, Any]) -> list[Path]:
+        # NOTE: The rows are streamed from the data file to a LaTeX file that the
+        # table '\input's, so neither Pandoc nor the Lua filters ever see them.
+        # Returns the LaTeX files of the tables.
+        body_files = []
+
+        for element in iter_elements(doc, "CodeBlock"):
+            # NOTE: CodeBlock is [Attr, text] and Attr is [identifier, classes,
+            # attributes].
+            identifier, classes, _ = element["c"][0]
+            attributes = get_element_attributes(element)
+
+            if DATA_TABLE_CLASS not in classes or "include" not in attributes:
+                continue
+
+            data_file = Path(attributes["include"])
+            delimiter = "\t" if data_file.suffix.lower() == ".tsv" else ","
+
+            body_file = self.output_dir / (
+                make_cache_key(hash_file(data_file) or "", delimiter) + ".tex"
+            )
+            head_latex, column_count = self._render_table(
+                data_file, body_file, delimiter=delimiter
+            )
+
+            element["t"] = "Div"
+            element["c"] = [
+                [
+                    identifier,
+                    [DATA_TABLE_DIV_CLASS],
+                    [
+                        *(
+                            [["caption", attributes["caption"]]]
+                            if "caption" in attributes
+                            else []
+                        ),
+                        [DATA_TABLE_HEAD_LATEX_ATTRIBUTE, head_latex],
+                        [
+                            DATA_TABLE_BODY_FILE_ATTRIBUTE,
+                            body_file.relative_to(Path.cwd()).as_posix(),
+                        ],
+                        [DATA_TABLE_COLUMNS_ATTRIBUTE, str(column_count)],
+                    ],
+                ],
+                [],
+            ]
+            body_files.append(body_file)
+
+        return list(dict.fromkeys(body_files))
+
+    def _render_table(
+        self, data_file: Path, body_file: Path, *, delimiter: str
+    ) -> tuple[str, int]:
+        # NOTE: The first row is the head of the table. It is read every time
+        # because it goes into the document, while the body is only written if
+        # there is no body file for this data file yet.
+        with open(data_file, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            head: list[str] = next(reader, [])
+            column_count = max(len(head), 1)
+            head_latex = _render_row(
+                ["\\thead{" + _escape_latex(cell) + "}" for cell in head],
+                column_count,
+            )
+
+            if not body_file.exists():
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                temp_file = make_temp_file(body_file)
+
+                try:
+                    with open(temp_file, "w") as output:
+                        _write_body_rows(reader, output, column_count, data_file)
+                    os.replace(temp_file, body_file)
+                finally:
+                    temp_file.unlink(missing_ok=True)
+
+        return head_latex, column_count
+
+
+def _write_body_rows(
+    reader: Any, output: TextIO, column_count: int, data_file: Path
+) -> None:
+    truncated_row_count = 0
+
+    for i, row in enumerate(reader):
+        if len(row) > column_count:
+            truncated_row_count += 1
+
+        if i != 0:
+            output.write(INSIDE_HRULE_LATEX + "\n")
+
+        output.write(_render_row([_escape_latex(cell) for cell in row], column_count))
+        output.write("\n")
+
+    if truncated_row_count:
+        rich.print(
+            f"[bold yellow]Warning: [/bold yellow]{truncated_row_count} rows of "
+            f"{data_file} have more cells than its head, the extra cells are dropped",
+        )
+
+
+def _render_row(cells_latex: list[str], column_count: int) -> str:
+    # NOTE: Rows are padded with empty cells to the width of the table.
+    cells_latex = cells_latex[:column_count]
+    cells_latex += [""] * (column_count - len(cells_latex))
+    return " & ".join(cells_latex) + " \\\\"
+
+
+def _escape_latex(text: str) -> str:
+    return _LATEX_SPECIAL_CHARACTERS_PATTERN.sub(
+        lambda m: _LATEX_SPECIAL_CHARACTERS[m.group()], text
+    )
@@ -0,0 +1,178 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pygments
+import rich
+from pygments.formatters.latex import LatexFormatter
+from pygments.lexers import find_lexer_class_by_name, get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from scholar.caches import ContentAddressedCache, make_cache_key
+from scholar.code_includes import parse_line_number
+from scholar.pandoc_json import get_element_attributes, iter_elements
+
+# NOTE: The Lua filters emit the value of this attribute instead of rendering
+# the code with 'minted'.
+HIGHLIGHTED_LATEX_ATTRIBUTE = "highlighted_latex"
+
+# NOTE: These match the '\setminted' options in the template.
+PYGMENTS_STYLE = "xcode"
+PYGMENTS_COMMAND_PREFIX = "PY"
+
+
+class CodeHighlighter:
+    def __init__(
+        self,
+        *,
+        cache_dir: Path,
+        style: str = PYGMENTS_STYLE,
+        max_workers: int | None = None,
+    ) -> None:
+        self.cache = ContentAddressedCache(cache_dir, suffix=".tex")
+        self.style = style
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def highlight_doc(self, doc: dict[str, Any]) -> None:
+        elements = []
+        jobs = []
+
+        for element in iter_elements(doc):
+            if element["t"] == "CodeBlock":
+                job = _make_code_block_job(element)
+            elif element["t"] == "Code":
+                job = _make_code_job(element)
+            else:
+                continue
+
+            # NOTE: Code blocks that can't be resolved (e.g. the ones that include
+            # missing files) are left to the Lua filters which report them.
+            if job is not None:
+                elements.append(element)
+                jobs.append(job)
+
+        self._warn_about_unknown_languages({job[1] for job in jobs})
+
+        keys = [
+            make_cache_key(pygments.__version__, self.style, *map(str, job))
+            for job in jobs
+        ]
+        highlighted_latexes: dict[str, str] = {}
+        uncached_jobs: dict[str, tuple[str, str, str, int | None]] = {}
+
+        for key, job in zip(keys, jobs):
+            cached_latex = self.cache.get(key)
+
+            if cached_latex is not None:
+                highlighted_latexes[key] = cached_latex.decode()
+            else:
+                uncached_jobs[key] = job
+
+        if uncached_jobs:
+            rich.print(
+                f"[bold yellow]Highlighting {len(uncached_jobs)} code elements with Pygments"
+            )
+
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                uncached_latexes = executor.map(
+                    _highlight,
+                    *zip(*uncached_jobs.values()),
+                    [self.style] * len(uncached_jobs),
+                    chunksize=max(1, len(uncached_jobs) // (self.max_workers * 4)),
+                )
+
+                for key, latex in zip(uncached_jobs, uncached_latexes):
+                    self.cache.put(key, latex.encode())
+                    highlighted_latexes[key] = latex
+
+        for element, key in zip(elements, keys):
+            # NOTE: Attributes are the last item of Attr which is the first item of
+            # the content of both CodeBlock and Code.
+            element["c"][0][2].append(
+                [HIGHLIGHTED_LATEX_ATTRIBUTE, highlighted_latexes[key]]
+            )
+
+    def write_style_defs_file(self, style_defs_file: Path) -> None:
+        style_defs = LatexFormatter(
+            style=self.style, commandprefix=PYGMENTS_COMMAND_PREFIX
+        ).get_style_defs()
+
+        style_defs_file.parent.mkdir(parents=True, exist_ok=True)
+        style_defs_file.write_text(style_defs + "\n")
+
+    @staticmethod
+    def _warn_about_unknown_languages(languages: set[str]) -> None:
+        for language in sorted(languages):
+            try:
+                find_lexer_class_by_name(language)
+            except ClassNotFound:
+                rich.print(
+                    f"[bold yellow]Warning: [/bold yellow]Unknown code language: {language}",
+                )
+
+
+def _make_code_block_job(
+    code_block: dict[str, Any]
+) -> tuple[str, str, str, int | None] | None:
+    # NOTE: CodeBlock is [Attr, text] and Attr is [identifier, classes, attributes].
+    classes = code_block["c"][0][1]
+    attributes = get_element_attributes(code_block)
+
+    # NOTE: Code blocks that 'CodeIncluder' couldn't include are left to the Lua
+    # filters which report them.
+    if "include" in attributes:
+        return None
+
+    try:
+        start_line_number = parse_line_number(attributes.get("from"))
+    except ValueError:
+        return None
+
+    # NOTE: The text is trimmed the same way 'trim_code_block.lua' trims it.
+    text = code_block["c"][1]
+    text = re.sub(r"\n+$", "", re.sub(r"^\n+", "", text))
+    language = classes[0] if classes else "text"
+
+    return "CodeBlock", language, text, start_line_number
+
+
+def _make_code_job(code: dict[str, Any]) -> tuple[str, str, str, int | None]:
+    # NOTE: Code is [Attr, text].
+    classes = code["c"][0][1]
+    language = classes[0] if classes else "text"
+
+    return "Code", language, code["c"][1], None
+
+
+def _highlight(
+    kind: str, language: str, text: str, start_line_number: int | None, style: str
+) -> str:
+    try:
+        lexer = get_lexer_by_name(language, stripnl=False, ensurenl=kind != "Code")
+    except ClassNotFound:
+        lexer = get_lexer_by_name("text", stripnl=False, ensurenl=kind != "Code")
+
+    if kind == "Code":
+        formatter = LatexFormatter(
+            style=style, commandprefix=PYGMENTS_COMMAND_PREFIX, nowrap=True
+        )
+        highlighted_text = pygments.highlight(text, lexer, formatter)
+        delimiter = next((d for d in "|!+=;:@/.,*?" if d not in highlighted_text), None)
+
+        # NOTE: '\Verb' needs a delimiter that doesn't occur in the code.
+        if delimiter is None:
+            return "\\texttt{" + highlighted_text + "}"
+
+        return (
+            "\\Verb[commandchars=\\\\\\{\\}]" + delimiter + highlighted_text + delimiter
+        )
+
+    verboptions = (
+        f"firstnumber={start_line_number}" if start_line_number is not None else ""
+    )
+    formatter = LatexFormatter(
+        style=style, commandprefix=PYGMENTS_COMMAND_PREFIX, verboptions=verboptions
+    )
+    return pygments.highlight(text, lexer, formatter).rstrip("\n")
@@ -0,0 +1,361 @@
+import importlib.util
+import math
+import os
+import re
+import shutil
+import subprocess
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from scholar.caches import FileHashIndex, make_cache_key, make_temp_file
+from scholar.pandoc_json import (
+    get_element_attributes,
+    get_image_src,
+    iter_elements,
+    set_image_src,
+)
+
+# NOTE: This must match the filter ID in 'convert_image_from_svg_to_pdf.lua'
+# because the filter looks the converted images up in the same directory.
+SVG_TO_PDF_FILTER_ID = (
+    "com.github.kirillgashkov.scholar.filters.convert_image_from_svg_to_pdf"
+)
+
+RASTER_IMAGES_CACHE_DIR_NAME = "raster-images-cache"
+RASTER_IMAGE_SUFFIXES = [".png", ".jpg", ".jpeg"]
+
+# NOTE: The line is 170 mm wide (see '\geometry' in the template), and images
+# without a 'width' attribute are never wider than 3/4 of it (see '\maxwidth' in
+# the template).
+LINE_WIDTH_IN = 170 / 25.4
+MAX_RASTER_IMAGE_WIDTH_IN = 0.75 * LINE_WIDTH_IN
+
+# NOTE: This is the resolution that Pandoc converts pixels in attributes with.
+PANDOC_DPI = 96
+
+# NOTE: This is the resolution that LaTeX assumes for images that don't specify
+# one.
+DEFAULT_RASTER_IMAGE_DPI = 72
+
+JPEG_QUALITY = 85
+
+
+class SVGToPDFImageConverter:
+    def __init__(
+        self,
+        *,
+        cache_dir: Path,
+        rsvg_convert_executable: str,
+        max_workers: int | None = None,
+    ) -> None:
+        self.filter_cache_dir = cache_dir / SVG_TO_PDF_FILTER_ID
+        # NOTE: SHA-1 is what 'pandoc.utils.sha1' in the Lua filter uses.
+        self.hash_index = FileHashIndex(
+            self.filter_cache_dir / "hash-index.json", algorithm="sha1"
+        )
+        self.rsvg_convert_executable = rsvg_convert_executable
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def get_uncached_images(self, doc: dict[str, Any]) -> dict[Path, Path]:
+        uncached_images = {}
+
+        for input_svg_file in get_svg_image_files(doc):
+            # NOTE: Missing images are left to the Lua filter which reports them.
+            if not input_svg_file.is_file():
+                continue
+
+            output_pdf_file = self.get_output_pdf_file(input_svg_file)
+
+            if not output_pdf_file.exists():
+                uncached_images[input_svg_file] = output_pdf_file
+
+        return uncached_images
+
+    def get_output_pdf_file(self, input_svg_file: Path) -> Path:
+        return self.filter_cache_dir / (
+            self.hash_index.hash_file(input_svg_file) + ".pdf"
+        )
+
+    def replace_svg_image_srcs(self, doc: dict[str, Any]) -> None:
+        # NOTE: Images are pointed to their converted PDFs so that the Lua filter
+        # doesn't have to read and hash them again.
+        for image in iter_elements(doc, "Image"):
+            input_svg_file = _get_svg_image_file(image)
+
+            if input_svg_file is None or not input_svg_file.is_file():
+                continue
+
+            output_pdf_file = self.get_output_pdf_file(input_svg_file)
+
+            if output_pdf_file.exists():
+                set_image_src(image, str(output_pdf_file))
+
+        self.hash_index.save()
+
+    def convert_images(self, images: dict[Path, Path]) -> None:
+        if not images:
+            return
+
+        self.filter_cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # NOTE: The work is done by 'rsvg-convert' processes, so threads are enough
+        # to keep all CPUs busy.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in executor.map(self._convert_image, images, images.values()):
+                pass
+
+    def _convert_image(self, input_svg_file: Path, output_pdf_file: Path) -> None:
+        # NOTE: The image is written to a temporary file first so that a failed or
+        # interrupted conversion never leaves a truncated PDF in the cache.
+        temp_pdf_file = make_temp_file(output_pdf_file)
+
+        try:
+            subprocess.run(
+                [
+                    self.rsvg_convert_executable,
+                    "--format",
+                    "pdf",
+                    # Use 72 dpi instead of the default 96 because tools like Figma
+                    # use the former for exports.
+                    "--dpi-x",
+                    "72",
+                    "--dpi-y",
+                    "72",
+                    "--output",
+                    str(temp_pdf_file),
+                    str(input_svg_file),
+                ],
+                check=True,
+            )
+            os.replace(temp_pdf_file, output_pdf_file)
+        finally:
+            temp_pdf_file.unlink(missing_ok=True)
+
+
+def get_svg_image_files(doc: dict[str, Any]) -> list[Path]:
+    svg_image_files = []
+
+    for image in iter_elements(doc, "Image"):
+        svg_image_file = _get_svg_image_file(image)
+
+        if svg_image_file is not None:
+            svg_image_files.append(svg_image_file)
+
+    return list(dict.fromkeys(svg_image_files))
+
+
+def _get_svg_image_file(image: dict[str, Any]) -> Path | None:
+    src = get_image_src(image)
+
+    if src.lower().endswith(".svg") and "://" not in src:
+        return Path(src)
+
+    return None
+
+
+class RasterImageOptimizer:
+    def __init__(
+        self,
+        *,
+        cache_dir: Path,
+        dpi: int,
+        max_width_in: float = MAX_RASTER_IMAGE_WIDTH_IN,
+        max_workers: int | None = None,
+    ) -> None:
+        self.images_cache_dir = cache_dir / RASTER_IMAGES_CACHE_DIR_NAME
+        self.hash_index = FileHashIndex(self.images_cache_dir / "hash-index.json")
+        self.dpi = dpi
+        self.max_width_in = max_width_in
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    @staticmethod
+    def is_available() -> bool:
+        # NOTE: Pillow is an optional dependency.
+        return importlib.util.find_spec("PIL") is not None
+
+    def get_uncached_images(
+        self, doc: dict[str, Any]
+    ) -> dict[Path, tuple[Path, float | None]]:
+        # NOTE: The same file can be rendered at different widths, so the images
+        # are keyed by their output files.
+        uncached_images = {}
+
+        for _, input_image_file, width_in in _iter_raster_images(doc):
+            # NOTE: Missing images are left to LaTeX which reports them.
+            if not input_image_file.is_file():
+                continue
+
+            output_image_file = self.get_output_image_file(input_image_file, width_in)
+
+            if not output_image_file.exists():
+                uncached_images[output_image_file] = (input_image_file, width_in)
+
+        return uncached_images
+
+    def get_output_image_file(
+        self, input_image_file: Path, width_in: float | None
+    ) -> Path:
+        key = make_cache_key(
+            self.hash_index.hash_file(input_image_file),
+            str(self.dpi),
+            f"{self.max_width_in:.4f}" if width_in is None else f"={width_in:.4f}",
+            str(JPEG_QUALITY),
+        )
+        return self.images_cache_dir / (key + input_image_file.suffix.lower())
+
+    def replace_raster_image_srcs(self, doc: dict[str, Any]) -> None:
+        for image, input_image_file, width_in in _iter_raster_images(doc):
+            if not input_image_file.is_file():
+                continue
+
+            output_image_file = self.get_output_image_file(input_image_file, width_in)
+
+            if output_image_file.exists():
+                set_image_src(image, str(output_image_file))
+
+        self.hash_index.save()
+
+    def optimize_images(self, images: dict[Path, tuple[Path, float | None]]) -> None:
+        if not images:
+            return
+
+        self.images_cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # NOTE: Resampling and compressing is done by Pillow in this process, so
+        # it takes processes to keep all CPUs busy.
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in executor.map(
+                _optimize_image,
+                [input_image_file for input_image_file, _ in images.values()],
+                images,
+                [self.dpi] * len(images),
+                [self.max_width_in] * len(images),
+                [width_in for _, width_in in images.values()],
+            ):
+                pass
+
+
+def _iter_raster_images(
+    doc: dict[str, Any]
+) -> Iterator[tuple[dict[str, Any], Path, float | None]]:
+    # NOTE: Yields the images with the width they are rendered at (at most), or
+    # None if they are rendered at their natural width (capped by '\maxwidth').
+    # Images with widths in units that don't translate to inches (e.g. 'em')
+    # are left as they are.
+    for image in iter_elements(doc, "Image"):
+        raster_image_file = _get_raster_image_file(image)
+
+        if raster_image_file is None:
+            continue
+
+        attributes = get_element_attributes(image)
+
+        if (width := attributes.get("width")) is not None:
+            if (width_in := _parse_width_in(width)) is not None:
+                yield image, raster_image_file, width_in
+        elif "height" in attributes:
+            # WTF: Pandoc gives images with a height (e.g. '30%') a width of
+            # '\textwidth' and they keep their aspect ratio, so they can be as
+            # wide as the line.
+            yield image, raster_image_file, LINE_WIDTH_IN
+        else:
+            yield image, raster_image_file, None
+
+
+def _parse_width_in(width: str) -> float | None:
+    # NOTE: These are the units that Pandoc's LaTeX writer understands. Widths
+    # without a unit are in pixels and percentages are of '\textwidth'.
+    match = re.fullmatch(r"([0-9]*\.?[0-9]+)\s*(px|cm|mm|in|inch|%)?", width.strip())
+
+    if match is None:
+        return None
+
+    value = float(match[1])
+    unit = match[2] or "px"
+
+    if unit == "px":
+        return value / PANDOC_DPI
+    elif unit == "cm":
+        return value / 2.54
+    elif unit == "mm":
+        return value / 25.4
+    elif unit in ["in", "inch"]:
+        return value
+    else:
+        return value / 100 * LINE_WIDTH_IN
+
+
+def _get_raster_image_file(image: dict[str, Any]) -> Path | None:
+    src = get_image_src(image)
+
+    if Path(src).suffix.lower() in RASTER_IMAGE_SUFFIXES and "://" not in src:
+        return Path(src)
+
+    return None
+
+
+def _optimize_image(
+    input_image_file: Path,
+    output_image_file: Path,
+    dpi: int,
+    max_width_in: float,
+    fixed_width_in: float | None,
+) -> None:
+    # NOTE: Images with a fixed width are scaled to it whatever their natural
+    # width is, the others are rendered at their natural width up to
+    # 'max_width_in'.
+    from PIL import Image
+
+    # NOTE: The image is written to a temporary file first so that a failed or
+    # interrupted optimization never leaves a truncated image in the cache.
+    temp_image_file = make_temp_file(output_image_file)
+
+    try:
+        with Image.open(input_image_file) as image:
+            dpi_x, dpi_y = (
+                d if d > 0 else DEFAULT_RASTER_IMAGE_DPI
+                for d in image.info.get("dpi", (0, 0))
+            )
+            width_in = (
+                fixed_width_in
+                if fixed_width_in is not None
+                else min(image.width / dpi_x, max_width_in)
+            )
+            target_width = math.ceil(width_in * dpi)
+
+            if target_width >= image.width:
+                # NOTE: The image is small enough already, and recompressing it
+                # wouldn't pay off.
+                shutil.copyfile(input_image_file, temp_image_file)
+            else:
+                target_height = max(1, round(image.height * target_width / image.width))
+
+                resized_image = (
+                    image.convert("RGBA") if image.mode == "P" else image
+                ).resize((target_width, target_height), Image.Resampling.LANCZOS)
+
+                # NOTE: The resolution is scaled with the image, so LaTeX lays it
+                # out at the same natural size as the original.
+                resized_dpi = (
+                    dpi_x * target_width / image.width,
+                    dpi_y * target_height / image.height,
+                )
+
+                if output_image_file.suffix == ".png":
+                    resized_image.save(
+                        temp_image_file, "PNG", dpi=resized_dpi, optimize=True
+                    )
+                else:
+                    resized_image.save(
+                        temp_image_file,
+                        "JPEG",
+                        dpi=resized_dpi,
+                        quality=JPEG_QUALITY,
+                        optimize=True,
+                    )
+
+        os.replace(temp_image_file, output_image_file)
+    finally:
+        temp_image_file.unlink(missing_ok=True)
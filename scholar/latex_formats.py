@@ -0,0 +1,94 @@
+import functools
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import rich
+
+from scholar.caches import file_lock, make_cache_key
+from scholar.profiling import profile
+
+# NOTE: This must match the marker in the template.
+END_OF_DUMP_MARKER = "\\csname endofdump\\endcsname"
+
+
+class LaTeXFormatBuilder:
+    def __init__(self, *, formats_dir: Path) -> None:
+        self.formats_dir = formats_dir
+
+    def get_format_file(self, tex_file: Path) -> Path | None:
+        with open(tex_file) as f:
+            tex = f.read()
+
+        if END_OF_DUMP_MARKER not in tex:
+            return None
+
+        # NOTE: The format is keyed by the part of the preamble that is dumped
+        # into it rather than by the whole template, so documents that only
+        # differ after the marker share the format.
+        dumped_preamble = tex[: tex.index(END_OF_DUMP_MARKER)]
+
+        # NOTE: A missing format only makes the build slower, so failing to build
+        # one isn't an error.
+        try:
+            return self._get_or_build_format_file(tex_file, dumped_preamble)
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            rich.print(
+                "[bold yellow]Warning: [/bold yellow]Failed to precompile the preamble, compiling without it",
+                file=sys.stderr,
+            )
+            return None
+
+    def _get_or_build_format_file(self, tex_file: Path, dumped_preamble: str) -> Path:
+        format_name = (
+            "scholar-" + make_cache_key(_get_xelatex_version(), dumped_preamble)[:16]
+        )
+        format_file = self.formats_dir / (format_name + ".fmt")
+
+        if format_file.exists():
+            return format_file
+
+        with file_lock(self.formats_dir / (format_name + ".lock")):
+            if not format_file.exists():
+                rich.print("[bold yellow]Precompiling the preamble")
+                with profile("Precompile preamble", category="latex"):
+                    self._build_format_file(tex_file, format_file)
+
+        return format_file
+
+    def _build_format_file(self, tex_file: Path, format_file: Path) -> None:
+        self.formats_dir.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=self.formats_dir) as temp_dir:
+            subprocess.run(
+                [
+                    "xelatex",
+                    "-ini",
+                    "-etex",
+                    "-interaction=nonstopmode",
+                    "-halt-on-error",
+                    "-jobname=" + format_file.stem,
+                    "-output-directory=" + temp_dir,
+                    # NOTE: 'mylatexformat' reads the preamble of the document
+                    # up to the end-of-dump marker and dumps it.
+                    "&xelatex",
+                    "mylatexformat.ltx",
+                    str(tex_file),
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=sys.stderr,
+                check=True,
+            )
+            # NOTE: The temporary directory is in the formats directory, so the
+            # format file appears there atomically.
+            shutil.move(Path(temp_dir) / format_file.name, format_file)
+
+
+@functools.cache
+def _get_xelatex_version() -> str:
+    completed_process = subprocess.run(
+        ["xelatex", "--version"], stdout=subprocess.PIPE, text=True, check=True
+    )
+    return completed_process.stdout.splitlines()[0]
@@ -0,0 +1,109 @@
+import re
+from pathlib import Path
+
+from scholar.caches import make_cache_key, write_file_if_changed
+
+# NOTE: These must match the markers in 'make_and_render_sections.lua'.
+SECTION_BEGIN_MARKER = "% scholar:section:begin"
+SECTION_END_MARKER = "% scholar:section:end"
+
+
+class SplitLaTeXFile:
+    def __init__(
+        self,
+        *,
+        tex_file: Path,
+        chunks: list[str],
+        section_files: list[Path],
+        sections: list[str],
+    ) -> None:
+        self.tex_file = tex_file
+        # NOTE: 'chunks' are the parts of the original file around the sections,
+        # there is always one more chunk than there are sections.
+        self.chunks = chunks
+        self.section_files = section_files
+        self.sections = sections
+
+    def get_skeleton_hash(self) -> str:
+        return make_cache_key(*self.chunks)
+
+    def get_section_hashes(self) -> list[str]:
+        return [make_cache_key(section) for section in self.sections]
+
+    def write(self, *, output_dir: Path, include_only: list[int] | None) -> None:
+        include_names = [_make_include_name(f) for f in self.section_files]
+
+        tex = self.chunks[0]
+        for include_name, chunk in zip(include_names, self.chunks[1:]):
+            tex += "\\include{" + include_name + "}\n" + chunk
+
+        if include_only is not None:
+            tex = tex.replace(
+                "\\begin{document}\n",
+                "\\includeonly{"
+                + ",".join(include_names[i] for i in include_only)
+                + "}\n\\begin{document}\n",
+                1,
+            )
+
+        self.tex_file.parent.mkdir(parents=True, exist_ok=True)
+
+        for section_file, section in zip(self.section_files, self.sections):
+            write_file_if_changed(section_file, section.encode())
+
+            # NOTE: LaTeX writes the '.aux' file of an included file next to the
+            # file in the output directory but doesn't create the directory.
+            (output_dir / section_file.parent.relative_to(Path.cwd())).mkdir(
+                parents=True, exist_ok=True
+            )
+
+        write_file_if_changed(self.tex_file, tex.encode())
+
+
+def split_latex_file(input_file: Path, *, split_tex_dir: Path) -> SplitLaTeXFile | None:
+    with open(input_file) as f:
+        lines = f.read().splitlines(keepends=True)
+
+    chunks: list[list[str]] = [[]]
+    sections: list[list[str]] = []
+    is_in_section = False
+
+    for line in lines:
+        if line.rstrip("\n") == SECTION_BEGIN_MARKER and not is_in_section:
+            sections.append([])
+            is_in_section = True
+        elif line.rstrip("\n") == SECTION_END_MARKER and is_in_section:
+            chunks.append([])
+            is_in_section = False
+        elif is_in_section:
+            sections[-1].append(line)
+        else:
+            chunks[-1].append(line)
+
+    if is_in_section:
+        raise ValueError(f"Unterminated section in {input_file}")
+
+    if not sections:
+        return None
+
+    section_files = [
+        split_tex_dir / f"{input_file.stem}-section-{i}.tex"
+        for i in range(1, len(sections) + 1)
+    ]
+
+    # WTF: The names of the included files are passed to LaTeX unescaped, so we
+    # make sure that they are safe (they are, as long as the work directory is).
+    for section_file in section_files:
+        if not re.match(r"^[A-Za-z0-9._\-\/]+$", _make_include_name(section_file)):
+            raise ValueError(f"Unsafe path for '\\include': {section_file}")
+
+    return SplitLaTeXFile(
+        tex_file=split_tex_dir / input_file.name,
+        chunks=["".join(chunk) for chunk in chunks],
+        section_files=section_files,
+        sections=["".join(section) for section in sections],
+    )
+
+
+def _make_include_name(section_file: Path) -> str:
+    return section_file.with_suffix("").relative_to(Path.cwd()).as_posix()
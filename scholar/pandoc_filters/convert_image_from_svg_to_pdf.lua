@@ -55,12 +55,20 @@ return {
                 .. ".pdf"
             )
 
+            -- NOTE: Scholar converts the images in parallel before running
+            -- Pandoc, so normally the converted image is already cached.
             if can_read_file(output_pdf_image_path) then
                 image.src = output_pdf_image_path
                 return image
             end
 
-            pandoc.pipe("mkdir", {filter_cache_dir}, "")
+            -- NOTE: The cache directory may be shared by concurrent builds, so
+            -- the image is converted to a temporary file first and then renamed.
+            local temp_pdf_image_path = (
+                output_pdf_image_path .. "." .. pandoc.utils.sha1(tostring({}) .. os.time()) .. ".tmp"
+            )
+
+            pandoc.pipe("mkdir", {"-p", filter_cache_dir}, "")
             pandoc.pipe(
                 scholar.settings.rsvg_convert_executable,
                 {
@@ -73,11 +81,12 @@ return {
                     "--dpi-y",
                     "72",
                     "--output",
-                    output_pdf_image_path,
+                    temp_pdf_image_path,
                     input_svg_image_path,
                 },
                 ""
             )
+            assert(os.rename(temp_pdf_image_path, output_pdf_image_path))
 
             image.src = output_pdf_image_path
             return image
@@ -5,17 +5,24 @@
 --
 -- This filter has security implications, so it should only be used with
 -- trusted input.
+--
+-- NOTE: Scholar includes code blocks before running Pandoc (see
+-- 'code_includes.py') and replaces their 'include' attribute with 'included'.
+-- This filter includes the rest and reports the ones that can't be included.
 
 local function parse_include_attributes(
     attributes -- pandoc.Attributes
 )
     local include_filepath = nil
+    local is_included = false
     local start_line_number = nil
     local end_line_number = nil
 
     for key, value in pairs(attributes) do
         if key == "include" then
             include_filepath = value
+        elseif key == "included" then
+            is_included = true
         elseif key == "from" then
             start_line_number = tonumber(value)
 
@@ -37,7 +44,7 @@ local function parse_include_attributes(
         end
     end
 
-    if include_filepath == nil and (start_line_number ~= nil or end_line_number ~= nil) then
+    if include_filepath == nil and not is_included and (start_line_number ~= nil or end_line_number ~= nil) then
         io.stderr:write(
             "Warning: code block has 'from' or 'to' attribute, but no 'include' attribute.\n"
         )
@@ -132,6 +132,37 @@ local function is_section_div(
     return has_value(div.classes, "section")
 end
 
+local scholar
+
+-- NOTE: These must match the markers in 'latex_sections.py'.
+local SECTION_BEGIN_MARKER = "% scholar:section:begin"
+local SECTION_END_MARKER = "% scholar:section:end"
+
+local function is_top_level_section_div(
+    div -- pandoc.Div
+)
+    local first_block = div.content[1]
+    return first_block ~= nil and first_block.t == "Header" and first_block.level == 1
+end
+
+local function should_split_sections()
+    return scholar ~= nil and scholar.settings.split_sections == true
+end
+
+-- Marks the LaTeX of a top-level section so that Scholar can split the
+-- document into files that are compiled separately with '\include'.
+local function with_section_markers(
+    blocks -- pandoc.Blocks
+)
+    local marked_blocks = pandoc.Blocks({})
+
+    marked_blocks:insert(pandoc.RawBlock("latex", SECTION_BEGIN_MARKER))
+    marked_blocks:extend(blocks)
+    marked_blocks:insert(pandoc.RawBlock("latex", SECTION_END_MARKER))
+
+    return marked_blocks
+end
+
 local function render_section(
     section -- pandoc.Div
 )
@@ -158,6 +189,8 @@ return {
         Pandoc = function (
             doc -- pandoc.Pandoc
         )
+            scholar = doc.meta.scholar
+
             return pandoc.Pandoc(
                 -- Creates Divs beginning at each Header and containing
                 -- following content until the next Header of comparable level.
@@ -175,6 +208,10 @@ return {
             div -- pandoc.Div
         )
             if is_section_div(div) then
+                if should_split_sections() and is_top_level_section_div(div) then
+                    return with_section_markers(render_section(div))
+                end
+
                 return render_section(div)
             end
         end
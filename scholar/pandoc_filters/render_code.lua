@@ -44,9 +44,26 @@ local function latex_to_inline(
 end
 
 
+local scholar
+
+
 local function make_code(
     code -- pandoc.Code
 )
+    -- NOTE: Scholar may have highlighted the code with Pygments ahead of time.
+    local highlighted_latex = code.attributes.highlighted_latex
+
+    if highlighted_latex ~= nil then
+        return pandoc.Inlines({latex_to_inline(highlighted_latex)})
+    end
+
+    -- NOTE: Code that Scholar didn't see (e.g. the one that comes from the
+    -- captions parsed by other filters) and code in draft builds is rendered as
+    -- plain text when 'minted' isn't loaded.
+    if scholar ~= nil and not scholar.constants.use_minted then
+        return pandoc.Code(code.text)
+    end
+
     local parsed_classes = parse_code_classes(code.classes)
 
     local language = parsed_classes.language
@@ -78,6 +95,13 @@ end
 
 if FORMAT:match("latex") then
     return {
+        {
+            Meta = function (
+                meta -- pandoc.Meta
+            )
+                scholar = meta.scholar
+            end,
+        },
         {
             Code = function (
                 code_el -- pandoc.Code
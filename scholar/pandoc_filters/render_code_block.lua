@@ -181,6 +181,9 @@ local function latex_to_inline(
 end
 
 
+local scholar
+
+
 local function make_code_block(
     code_block_el -- pandoc.CodeBlock
 )
@@ -248,21 +251,51 @@ local function make_code_block(
         inlines:insert(latex_to_inline("\\label{" .. identifier .. "}\n"))
     end
 
-    inlines:insert(latex_to_inline("\\begin{minted}"))
+    -- NOTE: Scholar may have highlighted the code block with Pygments
+    -- ahead of time, in which case it is already a 'Verbatim' environment.
+    local highlighted_latex = code_block_el.attributes.highlighted_latex
 
-    if has_start_line_number then
-        inlines:insert(latex_to_inline("[firstnumber=" .. start_line_number .. "]"))
-    end
+    if highlighted_latex ~= nil then
+        inlines:extend(
+            {
+                latex_to_inline(highlighted_latex),
+                latex_to_inline("\n"),
+            }
+        )
+    elseif scholar ~= nil and not scholar.constants.use_minted then
+        -- NOTE: Code blocks are rendered as plain text when 'minted' isn't
+        -- loaded (e.g. in draft builds).
+        inlines:insert(latex_to_inline("\\begin{Verbatim}"))
+
+        if has_start_line_number then
+            inlines:insert(latex_to_inline("[firstnumber=" .. start_line_number .. "]"))
+        end
+
+        inlines:extend(
+            {
+                latex_to_inline("\n"),
+                latex_to_inline(code_block_el.text),
+                latex_to_inline("\n"),
+                latex_to_inline("\\end{Verbatim}\n"),
+            }
+        )
+    else
+        inlines:insert(latex_to_inline("\\begin{minted}"))
 
-    inlines:insert(latex_to_inline("{" .. language .. "}\n"))
+        if has_start_line_number then
+            inlines:insert(latex_to_inline("[firstnumber=" .. start_line_number .. "]"))
+        end
 
-    inlines:extend(
-        {
-            latex_to_inline(code_block_el.text),
-            latex_to_inline("\n"),
-            latex_to_inline("\\end{minted}\n"),
-        }
-    )
+        inlines:insert(latex_to_inline("{" .. language .. "}\n"))
+
+        inlines:extend(
+            {
+                latex_to_inline(code_block_el.text),
+                latex_to_inline("\n"),
+                latex_to_inline("\\end{minted}\n"),
+            }
+        )
+    end
 
     if is_listing then
         inlines:insert(latex_to_inline("\\end{longlisting}"))
@@ -278,6 +311,13 @@ end
 
 
 return {
+    {
+        Meta = function (
+            meta -- pandoc.Meta
+        )
+            scholar = meta.scholar
+        end,
+    },
     {
         CodeBlock = function (
             code_block -- pandoc.CodeBlock
@@ -289,7 +329,8 @@ return {
             local classes_of_code_block_to_render = code_block.classes:clone()
 
             local attributes_of_code_block_to_render = {
-                ["from"] = code_block.attributes["from"]
+                ["from"] = code_block.attributes["from"],
+                ["highlighted_latex"] = code_block.attributes["highlighted_latex"],
             }
 
             local code_block_to_render = pandoc.CodeBlock(
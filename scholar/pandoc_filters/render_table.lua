@@ -379,15 +379,13 @@ local function table_head_to_content_blocks(
     return blocks
 end
 
-local function longtable_head_blocks(
-    table_head_el, -- pandoc.TableHead
+local function longtable_head_blocks_of_content_blocks(
+    content_blocks, -- pandoc.Blocks
     caption_block_of_table_start_or_nil, -- pandoc.Block-like or nil
     caption_block_of_table_continuation_or_nil -- pandoc.Block-like or nil
 )
     local blocks = pandoc.Blocks({})
 
-    local content_blocks = table_head_to_content_blocks(table_head_el)
-
     if caption_block_of_table_start_or_nil ~= nil then
         blocks:insert(caption_block_of_table_start_or_nil)
     end
@@ -403,6 +401,18 @@ local function longtable_head_blocks(
     return blocks
 end
 
+local function longtable_head_blocks(
+    table_head_el, -- pandoc.TableHead
+    caption_block_of_table_start_or_nil, -- pandoc.Block-like or nil
+    caption_block_of_table_continuation_or_nil -- pandoc.Block-like or nil
+)
+    return longtable_head_blocks_of_content_blocks(
+        table_head_to_content_blocks(table_head_el),
+        caption_block_of_table_start_or_nil,
+        caption_block_of_table_continuation_or_nil
+    )
+end
+
 -- Longtable foot
 
 local function table_foot_to_table_rows(
@@ -475,35 +485,42 @@ end
 
 -- Longtable
 
-local function longtable_blocks(
-    table_el -- pandoc.Table
+local function longtable_captions(
+    table_el -- pandoc.Table-like (caption and identifier)
 )
-    local blocks = pandoc.Blocks({})
-
     local is_table_numbered = (
         is_main_table_caption_provided(table_el.caption.long)
         or is_lot_table_caption_provided(table_el.caption.short)
         or is_table_id_provided(table_el.identifier)
     )
 
-    local latex_environment_name_of_table
-    local caption_block_of_table_start_or_nil
-    local caption_block_of_table_continuation
-    
     if is_table_numbered then
-        latex_environment_name_of_table = "longtable"
-        caption_block_of_table_start_or_nil = caption_block_of_numbered_table_start(table_el.caption.long, table_el.caption.short, table_el.identifier)
-        caption_block_of_table_continuation = caption_block_of_numbered_table_continuation()
+        return {
+            latex_environment_name_of_table = "longtable",
+            caption_block_of_table_start_or_nil = caption_block_of_numbered_table_start(table_el.caption.long, table_el.caption.short, table_el.identifier),
+            caption_block_of_table_continuation = caption_block_of_numbered_table_continuation(),
+        }
     else
-        latex_environment_name_of_table = "longtable*"
-        caption_block_of_table_start_or_nil = nil
-        caption_block_of_table_continuation = caption_block_of_unnumbered_table_continuation()
+        return {
+            latex_environment_name_of_table = "longtable*",
+            caption_block_of_table_start_or_nil = nil,
+            caption_block_of_table_continuation = caption_block_of_unnumbered_table_continuation(),
+        }
     end
+end
+
+local function longtable_blocks(
+    table_el -- pandoc.Table
+)
+    local blocks = pandoc.Blocks({})
+
+    local captions = longtable_captions(table_el)
+    local latex_environment_name_of_table = captions.latex_environment_name_of_table
 
     -- WTF: The table foot goes before the table body
     -- because of the way longtables works.
     blocks:insert(latex_to_block("\\begin{" .. latex_environment_name_of_table .. "}" .. longtable_spec_latex(table_el.colspecs)))
-    blocks:extend(longtable_head_blocks(table_el.head, caption_block_of_table_start_or_nil, caption_block_of_table_continuation))
+    blocks:extend(longtable_head_blocks(table_el.head, captions.caption_block_of_table_start_or_nil, captions.caption_block_of_table_continuation))
     blocks:extend(longtable_foot_blocks(table_el.foot))
     blocks:extend(longtable_body_blocks(table_el.bodies))
     blocks:insert(latex_to_block("\\end{" .. latex_environment_name_of_table .. "}"))
@@ -511,6 +528,44 @@ local function longtable_blocks(
     return blocks
 end
 
+-- Data table
+--
+-- Scholar renders the rows of tables that come from CSV and TSV files (see
+-- 'data_tables.py') to a LaTeX file of their own. Only the head row is passed
+-- in the document, the body is '\input' from the file by the same longtable
+-- that 'longtable_blocks' makes.
+
+local function data_longtable_blocks(
+    table_el, -- pandoc.Table-like (caption and identifier)
+    column_count, -- int
+    head_latex, -- string
+    body_file -- string
+)
+    local blocks = pandoc.Blocks({})
+
+    local captions = longtable_captions(table_el)
+    local latex_environment_name_of_table = captions.latex_environment_name_of_table
+
+    local colspec_els = pandoc.List({})
+    for _ = 1, column_count do
+        colspec_els:insert({"AlignDefault", nil})
+    end
+
+    local head_content_blocks = pandoc.Blocks({
+        latex_to_block(hrule_latex(string.format("%.4f", OUTSIDE_HRULE_THICKNESS_IN_PT) .. "pt")),
+        latex_to_block(head_latex),
+        latex_to_block(hrule_latex(string.format("%.4f", INSIDE_HRULE_THICKNESS_IN_PT) .. "pt")),
+    })
+
+    blocks:insert(latex_to_block("\\begin{" .. latex_environment_name_of_table .. "}" .. longtable_spec_latex(colspec_els)))
+    blocks:extend(longtable_head_blocks_of_content_blocks(head_content_blocks, captions.caption_block_of_table_start_or_nil, captions.caption_block_of_table_continuation))
+    blocks:extend(longtable_foot_blocks({rows = {}}))
+    blocks:insert(latex_to_block("\\input{" .. body_file .. "}"))
+    blocks:insert(latex_to_block("\\end{" .. latex_environment_name_of_table .. "}"))
+
+    return blocks
+end
+
 
 --------------------------------------------------------------------------------
 --------------------------------------------------------------------------------
@@ -558,6 +613,41 @@ return {
             end
 
             return longtable_blocks(table_to_render)
-        end
+        end,
+
+        Div = function (
+            div -- pandoc.Div
+        )
+            if not div.classes:includes("data-table") then
+                return nil
+            end
+
+            local id = get_table_id(div)
+            local caption = get_table_caption(div)
+            local captionable = Captionable:new(id, caption)
+
+            local table_to_render = {
+                caption = {long = pandoc.Blocks({}), short = nil},
+                identifier = "",
+            }
+
+            if captionable:has_caption() then
+                table_to_render.caption = {
+                    long = pandoc.Blocks({pandoc.Plain(captionable.caption or {})}),
+                    short = nil
+                }
+
+                if captionable.id ~= nil then
+                    table_to_render.identifier = captionable.id
+                end
+            end
+
+            return data_longtable_blocks(
+                table_to_render,
+                tonumber(div.attributes.columns),
+                div.attributes.head_latex,
+                div.attributes.body_file
+            )
+        end,
     }
 }
@@ -0,0 +1,205 @@
+-- Run all Scholar filters in as few document traversals as possible.
+--
+-- Passing every filter with its own '--lua-filter' option makes Pandoc load
+-- the document into Lua once per filter. This filter loads the other filters
+-- as modules and fuses their handlers into a few traversals instead.
+--
+----- FUSING RULES -------------------------------------------------------------
+--
+-- Pandoc traverses each filter typewise: first it calls the handlers of inline
+-- elements, then the handlers of block elements, then 'Meta' and 'Pandoc'.
+-- Therefore two filters can share a traversal only if the second one doesn't
+-- need to see the output of the first one's handlers of a "later" type (e.g.
+-- 'render_link_reference.lua' must see the captions that 'render_code_block.lua'
+-- creates in its 'CodeBlock' handler) and if no handler of the second one can
+-- see an element nested into an element that the first one handles (e.g. the
+-- cells of a table, which 'render_table.lua' flattens).
+--
+-- Handlers of the same element type are chained in the order of their filters:
+-- each handler gets the element returned by the previous one until a handler
+-- returns an element of another type or a list.
+
+
+local FILTER_PASSES = {
+    {
+        {"render_table", 1},
+        {"convert_image_from_svg_to_pdf", 1}, -- Meta
+        {"render_code", 1}, -- Meta
+        {"render_code_block", 1}, -- Meta
+    },
+    {
+        {"render_image", 1},
+        {"render_math", 1},
+        {"include_code_block", 1},
+        {"trim_code_block", 1},
+        {"render_code_block", 2},
+    },
+    {
+        {"render_code", 2},
+        {"render_link_reference", 1},
+        {"render_link_citation", 1},
+        {"render_div_list_of_references", 1},
+        {"render_div_table_of_contents", 1},
+        {"make_and_render_sections", 1}, -- Pandoc
+    },
+    {
+        {"make_and_render_sections", 2}, -- Div
+        {"convert_image_from_svg_to_pdf", 2}, -- Image
+    },
+}
+
+
+local filters_dir = pandoc.path.directory(PANDOC_SCRIPT_FILE)
+local loaded_filter_modules = {}
+
+-- NOTE: When Scholar profiles the build, it asks for the CPU time spent in the
+-- handlers of each filter to be written to this file as a JSON object.
+local filter_times_file = os.getenv("SCHOLAR_PROFILE_LUA_FILTER_TIMES_FILE")
+local filter_times = {}
+local filter_names = {}
+
+
+local function load_filter_module(
+    name -- string
+)
+    if loaded_filter_modules[name] == nil then
+        -- NOTE: Some filters return nothing if they don't support the output
+        -- format (e.g. 'render_code.lua').
+        loaded_filter_modules[name] = dofile(
+            pandoc.path.join({filters_dir, name .. ".lua"})
+        ) or {}
+    end
+
+    return loaded_filter_modules[name]
+end
+
+
+local function timed_handler(
+    filter_name, -- string
+    handler -- function
+)
+    if filter_times[filter_name] == nil then
+        filter_times[filter_name] = 0
+        table.insert(filter_names, filter_name)
+    end
+
+    return function (
+        element -- pandoc.Inline | pandoc.Block | pandoc.Meta | pandoc.Pandoc
+    )
+        local start_time = os.clock()
+        local result = handler(element)
+        filter_times[filter_name] = filter_times[filter_name] + os.clock() - start_time
+        return result
+    end
+end
+
+
+local function write_filter_times()
+    local entries = {}
+
+    for _, filter_name in ipairs(filter_names) do
+        table.insert(
+            entries,
+            string.format("%q: %.6f", filter_name, filter_times[filter_name])
+        )
+    end
+
+    local f = io.open(filter_times_file, "w")
+    f:write("{" .. table.concat(entries, ", ") .. "}")
+    f:close()
+end
+
+
+local function chain_handlers(
+    handlers -- list of functions
+)
+    if #handlers == 1 then
+        return handlers[1]
+    end
+
+    return function (
+        element -- pandoc.Inline | pandoc.Block | pandoc.Meta | pandoc.Pandoc
+    )
+        local tag = element.t
+        local result = nil
+
+        for _, handler in ipairs(handlers) do
+            local handler_result = handler(element)
+
+            if handler_result ~= nil then
+                result = handler_result
+
+                -- NOTE: Lists don't have a tag, so they stop the chain too.
+                if handler_result.t ~= tag then
+                    return result
+                end
+
+                element = handler_result
+            end
+        end
+
+        return result
+    end
+end
+
+
+local function fuse_filters(
+    filters -- list of {name, filter table}
+)
+    local handlers_by_type = {}
+
+    for _, named_filter in ipairs(filters) do
+        local filter_name, filter = named_filter[1], named_filter[2]
+
+        for type_, handler in pairs(filter) do
+            if handlers_by_type[type_] == nil then
+                handlers_by_type[type_] = {}
+            end
+
+            if filter_times_file ~= nil then
+                handler = timed_handler(filter_name, handler)
+            end
+
+            table.insert(handlers_by_type[type_], handler)
+        end
+    end
+
+    local fused_filter = {}
+
+    for type_, handlers in pairs(handlers_by_type) do
+        fused_filter[type_] = chain_handlers(handlers)
+    end
+
+    return fused_filter
+end
+
+
+local fused_filters = {}
+
+for _, filter_pass in ipairs(FILTER_PASSES) do
+    local filters = {}
+
+    for _, filter_ref in ipairs(filter_pass) do
+        local filter_module_name, filter_index = filter_ref[1], filter_ref[2]
+        local filter = load_filter_module(filter_module_name)[filter_index]
+
+        if filter ~= nil then
+            table.insert(filters, {filter_module_name, filter})
+        end
+    end
+
+    table.insert(fused_filters, fuse_filters(filters))
+end
+
+if filter_times_file ~= nil then
+    table.insert(fused_filters, {
+        Pandoc = function (
+            doc -- pandoc.Pandoc
+        )
+            write_filter_times()
+        end,
+    })
+end
+
+
+return fused_filters
@@ -0,0 +1,130 @@
+import json
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any, TextIO
+
+
+def iter_elements(node: Any, tag: str | None = None) -> Iterator[dict[str, Any]]:
+    # NOTE: The document is walked with an explicit stack instead of recursion
+    # because Pandoc JSON ASTs of large documents can be nested quite deeply. The
+    # elements are yielded in document order. Only the content ("c") of elements
+    # is walked, their tags ("t") can't contain other elements.
+    stack = [node]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, list):
+            stack.extend(reversed(value))
+        elif isinstance(value, dict):
+            if "t" in value:
+                if tag is None or value["t"] == tag:
+                    yield value
+                if "c" in value:
+                    stack.append(value["c"])
+            else:
+                stack.extend(reversed(list(value.values())))
+
+
+def get_element_attributes(element: dict[str, Any]) -> dict[str, str]:
+    # NOTE: Attr is [identifier, [class, ...], [[key, value], ...]] and it is the
+    # first item of the content of every element that has attributes.
+    return dict(element["c"][0][2])
+
+
+def get_image_src(image: dict[str, Any]) -> str:
+    # NOTE: Image is [Attr, [Inline], [src, title]].
+    src: str = image["c"][2][0]
+    return src
+
+
+def set_image_src(image: dict[str, Any], src: str) -> None:
+    image["c"][2][0] = src
+
+
+def get_dependency_files(doc: dict[str, Any]) -> list[Path]:
+    dependency_files = []
+
+    for element in iter_elements(doc):
+        if element["t"] == "CodeBlock":
+            include_filepath = get_element_attributes(element).get("include")
+
+            if include_filepath is not None:
+                dependency_files.append(Path(include_filepath))
+        elif element["t"] == "Image":
+            src = get_image_src(element)
+
+            if "://" not in src and not src.startswith("data:"):
+                dependency_files.append(Path(src))
+
+    return list(dict.fromkeys(dependency_files))
+
+
+def write_doc(doc: dict[str, Any], f: TextIO, *, extra_meta_json: str = "{}") -> None:
+    # NOTE: The members of 'extra_meta_json' (a "meta" object that has already
+    # been serialized, e.g. by 'write_meta') are spliced into the metadata of the
+    # document as they are. They must not share keys with it.
+    f.write('{"pandoc-api-version":')
+    json.dump(doc["pandoc-api-version"], f)
+    f.write(',"meta":{')
+    f.write(
+        ",".join(
+            members
+            for members in [
+                json.dumps(doc["meta"], ensure_ascii=False)[1:-1],
+                extra_meta_json.strip()[1:-1],
+            ]
+            if members
+        )
+    )
+    f.write('},"blocks":')
+    json.dump(doc["blocks"], f, ensure_ascii=False)
+    f.write("}")
+
+
+def write_meta(meta: Mapping[str, Any], f: TextIO) -> None:
+    # NOTE: Writes the "meta" object of a Pandoc JSON document made of plain
+    # Python values straight to the stream, without building the MetaValue
+    # elements first. Dicts become MetaMaps, lists become MetaLists, bools become
+    # MetaBools and everything else becomes a MetaString. Nones are left out.
+    f.write("{")
+    _write_meta_map_items(meta, f)
+    f.write("}")
+
+
+def _write_meta_value(value: Any, f: TextIO) -> None:
+    if isinstance(value, dict):
+        f.write('{"t":"MetaMap","c":{')
+        _write_meta_map_items(value, f)
+        f.write("}}")
+    elif isinstance(value, list):
+        f.write('{"t":"MetaList","c":[')
+        is_first = True
+        for item in value:
+            if item is None:
+                continue
+            if not is_first:
+                f.write(",")
+            _write_meta_value(item, f)
+            is_first = False
+        f.write("]}")
+    elif isinstance(value, bool):
+        f.write('{"t":"MetaBool","c":true}' if value else '{"t":"MetaBool","c":false}')
+    else:
+        f.write('{"t":"MetaString","c":')
+        f.write(json.dumps(str(value), ensure_ascii=False))
+        f.write("}")
+
+
+def _write_meta_map_items(meta: Mapping[str, Any], f: TextIO) -> None:
+    is_first = True
+
+    for key, value in meta.items():
+        if value is None:
+            continue
+        if not is_first:
+            f.write(",")
+        f.write(json.dumps(key, ensure_ascii=False))
+        f.write(":")
+        _write_meta_value(value, f)
+        is_first = False
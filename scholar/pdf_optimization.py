@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import importlib.util
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+from scholar.caches import make_temp_file
+
+# NOTE: qpdf exits with this code when it has succeeded with warnings.
+QPDF_WARNINGS_EXIT_CODE = 3
+
+
+class PDFOptimizer:
+    # NOTE: The PDF is linearized ("fast web view") and its objects are packed
+    # into compressed object streams. With pikepdf (an optional dependency that
+    # wraps qpdf), identical images, forms (e.g. the pages of the title page
+    # inserted with '\includepdf') and font files are also stored only once.
+    # Without pikepdf, the 'qpdf' command is used if it is installed.
+    def __init__(self, *, qpdf_executable: str) -> None:
+        self.qpdf_executable = qpdf_executable
+
+    def get_backend(self) -> str | None:
+        if importlib.util.find_spec("pikepdf") is not None:
+            return "pikepdf"
+
+        if shutil.which(self.qpdf_executable) is not None:
+            return "qpdf"
+
+        return None
+
+    def get_backend_version(self) -> str | None:
+        backend = self.get_backend()
+
+        if backend == "pikepdf":
+            import pikepdf
+
+            return f"pikepdf {pikepdf.__version__}"
+        elif backend == "qpdf":
+            return _get_qpdf_version(self.qpdf_executable)
+        else:
+            return None
+
+    def optimize(self, input_pdf_file: Path, output_pdf_file: Path) -> None:
+        backend = self.get_backend()
+
+        if backend is None:
+            raise FileNotFoundError("Neither pikepdf nor qpdf is installed")
+
+        # NOTE: The PDF is written to a temporary file first so that a failed or
+        # interrupted optimization never leaves a truncated PDF behind.
+        output_pdf_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_pdf_file = make_temp_file(output_pdf_file)
+
+        try:
+            if backend == "pikepdf":
+                _optimize_with_pikepdf(input_pdf_file, temp_pdf_file)
+            else:
+                _optimize_with_qpdf(
+                    input_pdf_file, temp_pdf_file, qpdf_executable=self.qpdf_executable
+                )
+
+            os.replace(temp_pdf_file, output_pdf_file)
+        finally:
+            temp_pdf_file.unlink(missing_ok=True)
+
+
+def _optimize_with_pikepdf(input_pdf_file: Path, output_pdf_file: Path) -> None:
+    import pikepdf
+
+    try:
+        with pikepdf.open(input_pdf_file) as pdf:
+            # NOTE: Streams that refer to duplicates (e.g. images with duplicate
+            # soft masks) only become identical once those are replaced, hence
+            # the rounds.
+            while _deduplicate_streams(pdf):
+                pass
+
+            pdf.remove_unreferenced_resources()
+            pdf.save(
+                output_pdf_file,
+                linearize=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+                recompress_flate=True,
+            )
+    except pikepdf.PdfError as e:
+        raise ValueError(str(e)) from e
+
+
+def _deduplicate_streams(pdf: Any) -> int:
+    import pikepdf
+
+    font_file_objgens = set()
+
+    for obj in pdf.objects:
+        if (
+            isinstance(obj, pikepdf.Dictionary)
+            and obj.get("/Type") == "/FontDescriptor"
+        ):
+            for key in ["/FontFile", "/FontFile2", "/FontFile3"]:
+                if key in obj and obj[key].is_indirect:
+                    font_file_objgens.add(obj[key].objgen)
+
+    canonical_streams: dict[bytes, Any] = {}
+    replacements: dict[tuple[int, int], Any] = {}
+
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Stream):
+            continue
+
+        if (
+            obj.get("/Subtype") not in ["/Image", "/Form"]
+            and obj.objgen not in font_file_objgens
+        ):
+            continue
+
+        # NOTE: The streams are compared as they are stored, together with their
+        # dictionaries (without their lengths, which follow from the data).
+        stream_dict = {k: v for k, v in obj.stream_dict.items() if k != "/Length"}
+        stream_key = hashlib.sha256(
+            pikepdf.Dictionary(stream_dict).unparse(resolved=False)
+            + b"\0"
+            + obj.read_raw_bytes()
+        ).digest()
+
+        if (canonical_stream := canonical_streams.get(stream_key)) is None:
+            canonical_streams[stream_key] = obj
+        else:
+            replacements[obj.objgen] = canonical_stream
+
+    # NOTE: The duplicates stay in 'pdf.objects' until the PDF is saved, so the
+    # number of replaced references is what tells whether anything changed.
+    return sum(_replace_references(obj, replacements) for obj in pdf.objects)
+
+
+def _replace_references(obj: Any, replacements: dict[tuple[int, int], Any]) -> int:
+    import pikepdf
+
+    if isinstance(obj, pikepdf.Stream):
+        obj = obj.stream_dict
+
+    items: list[tuple[str | int, Any]]
+
+    if isinstance(obj, pikepdf.Dictionary):
+        items = [(key, obj[key]) for key in obj.keys()]
+    elif isinstance(obj, pikepdf.Array):
+        items = [(i, obj[i]) for i in range(len(obj))]
+    else:
+        return 0
+
+    replaced_count = 0
+
+    for key, value in items:
+        # NOTE: pikepdf returns scalars (numbers, booleans) as Python objects.
+        if not isinstance(value, pikepdf.Object):
+            continue
+
+        if value.is_indirect:
+            if (replacement := replacements.get(value.objgen)) is not None:
+                obj[key] = replacement
+                replaced_count += 1
+        else:
+            replaced_count += _replace_references(value, replacements)
+
+    return replaced_count
+
+
+def _optimize_with_qpdf(
+    input_pdf_file: Path, output_pdf_file: Path, *, qpdf_executable: str
+) -> None:
+    completed_process = subprocess.run(
+        [
+            qpdf_executable,
+            "--linearize",
+            "--object-streams=generate",
+            "--compress-streams=y",
+            "--recompress-flate",
+            str(input_pdf_file),
+            str(output_pdf_file),
+        ]
+    )
+
+    if completed_process.returncode not in [0, QPDF_WARNINGS_EXIT_CODE]:
+        raise subprocess.CalledProcessError(
+            completed_process.returncode, completed_process.args
+        )
+
+
+@functools.cache
+def _get_qpdf_version(qpdf_executable: str) -> str:
+    # NOTE: The first line looks like "qpdf version 11.1.1".
+    return subprocess.check_output(
+        [qpdf_executable, "--version"], text=True
+    ).splitlines()[0]
@@ -0,0 +1,218 @@
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from rich.table import Table
+
+# NOTE: Subprocesses that can't report their spans directly (latexmk's XeLaTeX and
+# BibTeX runs, Pandoc's Lua filters) append them to the files named by these
+# environment variables.
+SUBPROCESS_SPANS_FILE_ENV_VAR = "SCHOLAR_PROFILE_SUBPROCESS_SPANS_FILE"
+LUA_FILTER_TIMES_FILE_ENV_VAR = "SCHOLAR_PROFILE_LUA_FILTER_TIMES_FILE"
+
+
+class ProfileSpan:
+    def __init__(
+        self,
+        *,
+        name: str,
+        category: str,
+        start_time_ns: int,
+        wall_time_ns: int,
+        cpu_time_ns: int | None,
+        pid: int,
+        tid: int,
+    ) -> None:
+        self.name = name
+        self.category = category
+        self.start_time_ns = start_time_ns
+        self.wall_time_ns = wall_time_ns
+        self.cpu_time_ns = cpu_time_ns
+        self.pid = pid
+        self.tid = tid
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.spans: list[ProfileSpan] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, *, category: str) -> Iterator[None]:
+        # NOTE: The CPU time includes the CPU time of the subprocesses that have
+        # finished during the span (e.g. Pandoc).
+        start_time_ns = time.time_ns()
+        start_cpu_time_ns = _get_cpu_time_ns()
+
+        try:
+            yield
+        finally:
+            self.add_span(
+                ProfileSpan(
+                    name=name,
+                    category=category,
+                    start_time_ns=start_time_ns,
+                    wall_time_ns=time.time_ns() - start_time_ns,
+                    cpu_time_ns=_get_cpu_time_ns() - start_cpu_time_ns,
+                    pid=os.getpid(),
+                    tid=threading.get_native_id(),
+                )
+            )
+
+    def add_span(self, span: ProfileSpan) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def add_subprocess_spans(self, spans_file: Path) -> None:
+        try:
+            with open(spans_file) as f:
+                for line in f:
+                    self.add_span(ProfileSpan(**json.loads(line)))
+        except FileNotFoundError:
+            pass
+
+    def add_lua_filter_spans(
+        self, times_file: Path, *, start_time_ns: int, pid: int
+    ) -> None:
+        # NOTE: Lua filters only report the total CPU time of their handlers, so
+        # they are laid out one after another on a track of their own.
+        try:
+            with open(times_file) as f:
+                lua_filter_times = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        for name, seconds in lua_filter_times.items():
+            time_ns = int(seconds * 1_000_000_000)
+            self.add_span(
+                ProfileSpan(
+                    name="Lua filter: " + name,
+                    category="lua_filter",
+                    start_time_ns=start_time_ns,
+                    wall_time_ns=time_ns,
+                    cpu_time_ns=time_ns,
+                    pid=pid,
+                    tid=0,
+                )
+            )
+            start_time_ns += time_ns
+
+    def write_chrome_trace(self, trace_file: Path) -> None:
+        trace_events: list[dict[str, Any]] = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start_time_ns / 1000,
+                "dur": span.wall_time_ns / 1000,
+                "pid": span.pid,
+                "tid": span.tid,
+                "args": (
+                    {"cpu_ms": span.cpu_time_ns / 1_000_000}
+                    if span.cpu_time_ns is not None
+                    else {}
+                ),
+            }
+            for span in sorted(self.spans, key=lambda span: span.start_time_ns)
+        ]
+
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": trace_events}, f)
+
+    def make_summary_table(self) -> Table:
+        totals: dict[str, list[int]] = {}
+
+        for span in sorted(self.spans, key=lambda span: span.start_time_ns):
+            count, wall_time_ns, cpu_time_ns = totals.setdefault(span.name, [0, 0, 0])
+            totals[span.name] = [
+                count + 1,
+                wall_time_ns + span.wall_time_ns,
+                cpu_time_ns + (span.cpu_time_ns or 0),
+            ]
+
+        table = Table("Span", "Calls", "Wall, s", "CPU, s")
+        for name, (count, wall_time_ns, cpu_time_ns) in totals.items():
+            table.add_row(
+                name,
+                str(count),
+                f"{wall_time_ns / 1_000_000_000:.3f}",
+                f"{cpu_time_ns / 1_000_000_000:.3f}",
+            )
+
+        return table
+
+
+_profiler: Profiler | None = None
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+@contextlib.contextmanager
+def enable_profiling() -> Iterator[Profiler]:
+    global _profiler
+
+    _profiler = Profiler()
+
+    try:
+        yield _profiler
+    finally:
+        _profiler = None
+
+
+@contextlib.contextmanager
+def profile(name: str, *, category: str = "stage") -> Iterator[None]:
+    if _profiler is None:
+        yield
+        return
+
+    with _profiler.span(name, category=category):
+        yield
+
+
+def main() -> None:
+    # NOTE: This is the wrapper that latexmk runs XeLaTeX and BibTeX with when
+    # the build is profiled: 'python -m scholar.profiling COMMAND [ARG]...'.
+    args = sys.argv[1:]
+
+    start_time_ns = time.time_ns()
+    start_cpu_time_ns = _get_children_cpu_time_ns()
+    returncode = subprocess.run(args).returncode
+
+    spans_file = os.environ.get(SUBPROCESS_SPANS_FILE_ENV_VAR)
+    if spans_file:
+        with open(spans_file, "a") as f:
+            span = {
+                "name": "latexmk: " + Path(args[0]).name,
+                "category": "latexmk",
+                "start_time_ns": start_time_ns,
+                "wall_time_ns": time.time_ns() - start_time_ns,
+                "cpu_time_ns": _get_children_cpu_time_ns() - start_cpu_time_ns,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+            }
+            f.write(json.dumps(span) + "\n")
+
+    sys.exit(returncode)
+
+
+def _get_cpu_time_ns() -> int:
+    return time.process_time_ns() + _get_children_cpu_time_ns()
+
+
+def _get_children_cpu_time_ns() -> int:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return int((usage.ru_utime + usage.ru_stime) * 1_000_000_000)
+
+
+if __name__ == "__main__":
+    main()
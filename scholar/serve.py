@@ -0,0 +1,387 @@
+import json
+import queue
+import re
+import socketserver
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+
+import frontmatter
+import rich
+import typer
+
+from scholar.__main__ import build
+from scholar.caches import file_lock
+from scholar.constants import WORK_DIR
+from scholar.settings import (
+    ConfigFileNotFoundError,
+    FailedToLoadConfigFileError,
+    load_yaml_config_file,
+)
+from scholar.styles import DEFAULT_STYLE
+
+app = typer.Typer()
+
+# NOTE: Clients can only choose how a document looks. The other settings (e.g.
+# the executables that are run, the cache directory or the title page) are paths
+# on the server, they come from its environment and config file only.
+JOB_SETTINGS = ["style", "draft", "references"]
+
+# WTF: 'minted' needs LaTeX to run with '-shell-escape', which would let the raw
+# TeX in a client's Markdown (e.g. '\write18') run commands on the server, so
+# the code of served documents is always highlighted with Pygments.
+JOB_FORCED_SETTINGS = {"code_highlighting": "pygments"}
+
+MAX_REQUEST_BODY_SIZE = 16 * 1024 * 1024
+
+
+class RenderJob:
+    def __init__(
+        self, *, name: str, markdown: str, settings: dict[str, Any], to: str
+    ) -> None:
+        self.name = name
+        self.markdown = markdown
+        self.settings = settings
+        self.to = to
+
+        self.output: bytes | None = None
+        self.error: str | None = None
+        self.done = threading.Event()
+
+
+class RenderQueue:
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        workers: int,
+        config_file: Path | None,
+        yaml_config_file_settings: dict[str, Any] | None,
+    ) -> None:
+        self.config_file = config_file
+        self.yaml_config_file_settings = yaml_config_file_settings
+        self._jobs: queue.Queue[RenderJob] = queue.Queue(maxsize=max_size)
+
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, job: RenderJob) -> bool:
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            return False
+
+        return True
+
+    def qsize(self) -> int:
+        return self._jobs.qsize()
+
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+
+            try:
+                job.output = self._render(job)
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.done.set()
+                self._jobs.task_done()
+
+    def _render(self, job: RenderJob) -> bytes:
+        # NOTE: Jobs with the same name share a work directory, so re-rendering a
+        # document (e.g. from an editor preview) only redoes the stages that are
+        # out of date.
+        work_dir = _make_work_dir(job.name)
+        input_file = work_dir / "input" / (job.name + ".md")
+        output_file = work_dir / "output" / (job.name + "." + job.to)
+
+        # NOTE: The build locks the work directory only while it runs, so jobs
+        # with the same name (e.g. unnamed ones) could overwrite each other's
+        # input and output before and after it. This lock is held for the whole
+        # job, it is a different file so that it doesn't block the build.
+        with file_lock(
+            work_dir / "render.lock",
+            on_wait=lambda: rich.print(
+                f"[bold yellow]Waiting for another job named {job.name}"
+            ),
+        ):
+            input_file.parent.mkdir(parents=True, exist_ok=True)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            input_file.write_text(job.markdown)
+
+            rich.print(f"[bold yellow]Rendering {job.name} to {job.to}")
+
+            try:
+                build(
+                    input_file=input_file,
+                    output_file_or_dir=output_file,
+                    cli_settings={
+                        "style": DEFAULT_STYLE,
+                        **job.settings,
+                        **JOB_FORCED_SETTINGS,
+                    },
+                    config_file=self.config_file,
+                    convert_from_tex=False,
+                    convert_to_tex=job.to == "tex",
+                    work_dir=work_dir,
+                    yaml_config_file_settings=self.yaml_config_file_settings,
+                )
+            except typer.Exit:
+                raise RuntimeError(
+                    "The build failed, see the server output for details"
+                )
+
+            return output_file.read_bytes()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server: "RenderServer | UnixRenderServer"
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+
+        self._send_json(
+            HTTPStatus.OK,
+            {"status": "ok", "queued": self.server.render_queue.qsize()},
+        )
+
+    def do_POST(self) -> None:
+        if self.path != "/render":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+
+        # NOTE: Web pages can only send JSON to another origin after a CORS
+        # preflight, which the server doesn't answer, so they can't make it
+        # render documents.
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                {"error": "The Content-Type must be application/json"},
+            )
+            return
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            content_length = -1
+
+        # NOTE: A negative length would make the body be read until the client
+        # closes the connection.
+        if content_length < 0:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"})
+            return
+
+        if content_length > MAX_REQUEST_BODY_SIZE:
+            self._send_json(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                {"error": f"The body must be at most {MAX_REQUEST_BODY_SIZE} bytes"},
+            )
+            return
+
+        try:
+            job = self._read_job(content_length)
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+
+        if not self.server.render_queue.submit(job):
+            self._send_json(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": "The render queue is full"},
+                headers={"Retry-After": "1"},
+            )
+            return
+
+        job.done.wait()
+
+        if job.output is None:
+            self._send_json(
+                HTTPStatus.UNPROCESSABLE_ENTITY, {"error": job.error or "Unknown"}
+            )
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header(
+            "Content-Type",
+            "application/pdf" if job.to == "pdf" else "application/x-tex",
+        )
+        self.send_header("Content-Length", str(len(job.output)))
+        self.end_headers()
+        self.wfile.write(job.output)
+
+    def address_string(self) -> str:
+        # NOTE: Clients of Unix sockets don't have an address.
+        if isinstance(self.client_address, str):
+            return self.client_address or "unix"
+        return super().address_string()
+
+    def _read_job(self, content_length: int) -> RenderJob:
+        try:
+            body = json.loads(self.rfile.read(content_length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+        if not isinstance(body, dict) or not isinstance(body.get("markdown"), str):
+            raise ValueError("'markdown' must be a string")
+
+        settings = body.get("settings", {})
+        if not isinstance(settings, dict):
+            raise ValueError("'settings' must be an object")
+
+        # NOTE: The front matter of the document is a settings source too.
+        try:
+            front_matter_settings = frontmatter.loads(body["markdown"]).metadata
+        except Exception as e:
+            raise ValueError(f"Invalid front matter: {e}")
+
+        for key in [*settings, *front_matter_settings]:
+            if key not in JOB_SETTINGS:
+                raise ValueError(
+                    f"Setting '{key}' can't be set per job, only "
+                    + ", ".join(f"'{s}'" for s in JOB_SETTINGS)
+                    + " can"
+                )
+
+        to = body.get("to", "pdf")
+        if to not in ["pdf", "tex"]:
+            raise ValueError("'to' must be 'pdf' or 'tex'")
+
+        name = body.get("name", "document")
+        if not isinstance(name, str) or not re.match(
+            r"^[A-Za-z0-9_\-][A-Za-z0-9._\-]*$", name
+        ):
+            raise ValueError("'name' must be a file name without a leading dot")
+
+        return RenderJob(name=name, markdown=body["markdown"], settings=settings, to=to)
+
+    def _send_json(
+        self,
+        status: HTTPStatus,
+        content: dict[str, Any],
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        body = json.dumps(content).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RenderServer(ThreadingHTTPServer):
+    render_queue: RenderQueue
+
+
+class UnixRenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    render_queue: RenderQueue
+
+
+@app.command()
+def main(
+    host: str = typer.Option(
+        "127.0.0.1",
+        "--host",
+        help="The host to listen on.",
+    ),
+    port: int = typer.Option(
+        8000,
+        "--port",
+        help="The port to listen on.",
+    ),
+    socket_file: Optional[Path] = typer.Option(
+        None,
+        "--socket",
+        dir_okay=False,
+        help="The Unix socket to listen on instead of the host and port.",
+    ),
+    config_file: Optional[
+        Path
+    ] = typer.Option(  # See https://github.com/tiangolo/typer/issues/348
+        None,
+        "--config",
+        exists=True,
+        dir_okay=False,
+        readable=True,
+        help="The YAML config file shared by all documents.",
+    ),
+    queue_size: int = typer.Option(
+        16,
+        "--queue-size",
+        min=1,
+        help="The number of jobs that can wait for a worker.",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        min=1,
+        help="The number of jobs that are rendered at the same time.",
+    ),
+) -> None:
+    """
+    Render Markdown documents sent over HTTP.
+
+    POST /render accepts a JSON object with 'markdown', and optionally
+    'settings', 'to' ('pdf' or 'tex') and 'name', and responds with the
+    rendered document. Only the style, draft and references settings can be
+    set per document, code is always highlighted with Pygments.
+    """
+
+    try:
+        yaml_config_file_settings = (
+            load_yaml_config_file(config_file) if config_file else None
+        )
+    except (ConfigFileNotFoundError, FailedToLoadConfigFileError) as e:
+        rich.print(
+            f"[bold red]Error: [/bold red]Failed to load config file: {e.config_file}",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    render_queue = RenderQueue(
+        max_size=queue_size,
+        workers=workers,
+        config_file=config_file,
+        yaml_config_file_settings=yaml_config_file_settings,
+    )
+
+    server: RenderServer | UnixRenderServer
+    if socket_file is not None:
+        if socket_file.is_socket():
+            socket_file.unlink()
+        server = UnixRenderServer(str(socket_file), RenderRequestHandler)
+        address = str(socket_file)
+    else:
+        server = RenderServer((host, port), RenderRequestHandler)
+        address = f"http://{host}:{port}"
+
+    server.render_queue = render_queue
+
+    rich.print(f"[bold yellow]Listening on {address}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        raise typer.Exit()
+    finally:
+        server.server_close()
+        if socket_file is not None:
+            socket_file.unlink(missing_ok=True)
+
+
+def _make_work_dir(name: str) -> Path:
+    return WORK_DIR / "serve" / name
+
+
+if __name__ == "__main__":
+    app()
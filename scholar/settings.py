@@ -1,6 +1,6 @@
 import sys
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Literal
 
 import rich
 from pydantic import (
@@ -52,9 +52,18 @@ class Settings(BaseSettings):
     _cli_settings: dict[str, Any] = PrivateAttr()
     _yaml_front_matter_settings: dict[str, Any] = PrivateAttr()
     _yaml_config_file: Path | None = PrivateAttr()
+    _yaml_config_file_settings: dict[str, Any] | None = PrivateAttr()
 
     cache_dir: Path = CACHE_DIR
     rsvg_convert_executable: str = "rsvg-convert"
+    keep_pandoc_json_files: bool = False
+    code_highlighting: Literal["minted", "pygments"] = "minted"
+    precompile_preamble: bool = False
+    draft: bool = False
+    split_sections: bool = False
+    raster_image_dpi: int | None = None
+    optimize_pdf: bool = False
+    qpdf_executable: str = "qpdf"
 
     style: str
 
@@ -62,10 +71,9 @@ class Settings(BaseSettings):
     references: dict[str, str] = {}
 
     @validator("cache_dir")
-    def cache_dir_must_be_default(cls, v: Path) -> Path:
-        if v != CACHE_DIR:
-            raise ValueError("Non-default cache_dir is not yet supported.")
-        return v
+    def resolve_cache_dir(cls, v: Path) -> Path:
+        # NOTE: Relative cache directories are relative to the current directory.
+        return v.resolve()
 
     def __init__(
         self,
@@ -73,11 +81,15 @@ class Settings(BaseSettings):
         _cli_settings: dict[str, Any] | None = None,
         _yaml_front_matter_settings: dict[str, Any] | None = None,
         _yaml_config_file: Path | None = None,
+        _yaml_config_file_settings: dict[str, Any] | None = None,
         **init_settings: Any,
     ) -> None:
         self._cli_settings = _cli_settings or {}
         self._yaml_front_matter_settings = _yaml_front_matter_settings or {}
         self._yaml_config_file = _yaml_config_file
+        # NOTE: The settings of the config file can be passed in if they have
+        # already been loaded (e.g. once for a whole batch of documents).
+        self._yaml_config_file_settings = _yaml_config_file_settings
         self._settings_source_log = []
 
         try:
@@ -174,22 +186,28 @@ def yaml_front_matter_settings_source(settings: Settings) -> dict[str, Any]:
 
 
 def yaml_config_file_settings_source(settings: Settings) -> dict[str, Any]:
+    if settings._yaml_config_file_settings is not None:
+        return settings._yaml_config_file_settings
+
     if not settings._yaml_config_file:
         return {}
 
+    return load_yaml_config_file(settings._yaml_config_file)
+
+
+def load_yaml_config_file(config_file: Path) -> dict[str, Any]:
     try:
-        with open(settings._yaml_config_file) as f:
-            return safe_load(f)
+        with open(config_file) as f:
+            return safe_load(f) or {}
     except Exception as e:
         is_config_file_not_found_error = (
-            isinstance(e, FileNotFoundError)
-            and Path(e.filename) == settings._yaml_config_file
+            isinstance(e, FileNotFoundError) and Path(e.filename) == config_file
         )
 
         if is_config_file_not_found_error:
-            raise ConfigFileNotFoundError(settings._yaml_config_file) from e
+            raise ConfigFileNotFoundError(config_file) from e
 
-        raise FailedToLoadConfigFileError(settings._yaml_config_file) from e
+        raise FailedToLoadConfigFileError(config_file) from e
 
 
 class ConfigFileNotFoundError(Exception):
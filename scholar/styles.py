@@ -1,8 +1,13 @@
+from collections.abc import Callable
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from scholar.constants import PANDOC_TEMPLATE_FILE
-from scholar.settings import Settings
+
+if TYPE_CHECKING:
+    # NOTE: Importing the settings (pydantic, YAML) is slow, and listing the
+    # styles (e.g. for '--styles' or shell completion) doesn't need them.
+    from scholar.settings import Settings
 
 
 class Style:
@@ -26,6 +31,7 @@ class GostStyle(Style):
         disable_main_section_numbering: bool,
         disable_section_page_breaks: bool,
         disable_numbering_within_section: bool,
+        draft: bool,
     ) -> None:
         super().__init__(
             template_file=PANDOC_TEMPLATE_FILE,
@@ -34,6 +40,7 @@ class GostStyle(Style):
                 "disable_main_section_numbering": disable_main_section_numbering,
                 "disable_section_page_breaks": disable_section_page_breaks,
                 "disable_numbering_within_section": disable_numbering_within_section,
+                "draft": draft,
             },
         )
 
@@ -41,40 +48,54 @@ class GostStyle(Style):
 class GostThesisStyle(GostStyle):
     def __init__(
         self,
-        # *,
+        *,
         # title_page: Path | None = None,  # Implemented somewhere else for now.
+        draft: bool = False,
     ) -> None:
         super().__init__(
             # title_page=title_page,  # Implemented somewhere else for now.
             disable_main_section_numbering=False,
             disable_section_page_breaks=False,
             disable_numbering_within_section=False,
+            draft=draft,
         )
 
 
 class GostReportStyle(GostStyle):
     def __init__(
         self,
-        # *,
+        *,
         # title_page: Path | None = None,  # Implemented somewhere else for now.
+        draft: bool = False,
     ) -> None:
         super().__init__(
             # title_page=title_page,  # Implemented somewhere else for now.
             disable_main_section_numbering=True,
             disable_section_page_breaks=True,
             disable_numbering_within_section=True,
+            draft=draft,
         )
 
 
 DEFAULT_STYLE = "gost_thesis"
 
+# NOTE: The registry maps the names of the styles to their classes, so that the
+# names can be listed without building the styles.
+_STYLE_CLASSES: dict[str, Callable[..., Style]] = {
+    "gost_thesis": GostThesisStyle,
+    "gost_report": GostReportStyle,
+}
+
+
+def get_style_names() -> list[str]:
+    return list(_STYLE_CLASSES)
+
 
-def get_styles() -> dict[str, Style]:
+def get_styles(*, draft: bool = False) -> dict[str, Style]:
     return {
-        "gost_thesis": GostThesisStyle(),
-        "gost_report": GostReportStyle(),
+        name: style_class(draft=draft) for name, style_class in _STYLE_CLASSES.items()
     }
 
 
-def get_style(settings: Settings) -> Style:
-    return get_styles()[settings.style]
+def get_style(settings: "Settings") -> Style:
+    return _STYLE_CLASSES[settings.style](draft=settings.draft)
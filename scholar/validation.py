@@ -0,0 +1,228 @@
+import re
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from scholar.code_includes import parse_line_number
+from scholar.pandoc_json import get_element_attributes, get_image_src, iter_elements
+
+# NOTE: The elements that have an Attr as the first item of their content.
+# Header is [level, Attr, [Inline]], so its Attr is the second item.
+_ELEMENTS_WITH_ATTR = {"Code", "CodeBlock", "Div", "Image", "Link", "Span", "Table"}
+
+
+class ContentProblem:
+    def __init__(
+        self, *, message: str, source_file: Path, line_number: int | None
+    ) -> None:
+        self.message = message
+        self.source_file = source_file
+        self.line_number = line_number
+
+    def __str__(self) -> str:
+        if self.line_number is None:
+            return f"{self.source_file}: {self.message}"
+
+        return f"{self.source_file}:{self.line_number}: {self.message}"
+
+
+class ContentValidator:
+    # NOTE: The checks mirror what 'render_link_reference.lua',
+    # 'render_link_citation.lua', 'include_code_block.lua' and LaTeX would fail
+    # on (or leave unresolved) much later in the build. The document is walked
+    # once and the source files are only read to find the lines of problems.
+    def __init__(self, *, references: Mapping[str, str]) -> None:
+        self.references = references
+        self._source_lines: dict[Path, list[str]] = {}
+
+    def validate_doc(
+        self, doc: dict[str, Any], *, block_source_files: Sequence[Path]
+    ) -> list[ContentProblem]:
+        # NOTE: Each top-level block comes from the source file at the same index
+        # of 'block_source_files'.
+        problems = []
+        identifiers = set()
+        reference_ids: list[tuple[str, Path]] = []
+
+        for block, source_file in zip(doc["blocks"], block_source_files):
+            for element in iter_elements(block):
+                identifier = _get_element_identifier(element)
+
+                if identifier:
+                    if identifier in identifiers:
+                        problems.append(
+                            self._make_problem(
+                                f"Duplicate identifier: {identifier}",
+                                source_file,
+                                r"\{[^}]*#" + re.escape(identifier) + r"[\s}]",
+                            )
+                        )
+                    identifiers.add(identifier)
+
+                if element["t"] == "Link":
+                    problems.extend(
+                        self._validate_link(element, source_file, reference_ids)
+                    )
+                elif element["t"] == "CodeBlock":
+                    problems.extend(self._validate_code_block(element, source_file))
+                elif element["t"] == "Image":
+                    problems.extend(self._validate_image(element, source_file))
+
+        # NOTE: References can point forward, so they are checked once every
+        # identifier is known.
+        for reference_id, source_file in reference_ids:
+            if reference_id not in identifiers:
+                problems.append(
+                    self._make_problem(
+                        f"Unknown reference target: #{reference_id}",
+                        source_file,
+                        re.escape("](#" + reference_id),
+                    )
+                )
+
+        return problems
+
+    def _validate_link(
+        self,
+        link: dict[str, Any],
+        source_file: Path,
+        reference_ids: list[tuple[str, Path]],
+    ) -> list[ContentProblem]:
+        # NOTE: Link is [Attr, [Inline], [target, title]]. References are
+        # '[#](#id)' and citations are '[@](#key)'.
+        content = link["c"][1]
+        target: str = link["c"][2][0]
+
+        if content == [{"t": "Str", "c": "#"}]:
+            kind = "Reference"
+        elif content == [{"t": "Str", "c": "@"}]:
+            kind = "Citation"
+        else:
+            return []
+
+        if not target.startswith("#"):
+            return [
+                self._make_problem(
+                    f"{kind} target doesn't start with '#': {target}",
+                    source_file,
+                    re.escape("](" + target),
+                )
+            ]
+
+        if kind == "Reference":
+            reference_ids.append((target[1:], source_file))
+        elif target[1:] not in self.references:
+            return [
+                self._make_problem(
+                    f"Unknown citation key: {target[1:]}",
+                    source_file,
+                    re.escape("](" + target),
+                )
+            ]
+
+        return []
+
+    def _validate_code_block(
+        self, code_block: dict[str, Any], source_file: Path
+    ) -> list[ContentProblem]:
+        attributes = get_element_attributes(code_block)
+
+        if (include_filepath := attributes.get("include")) is None:
+            return []
+
+        problems = []
+
+        if not Path(include_filepath).is_file():
+            problems.append(
+                self._make_problem(
+                    f"Included file not found: {include_filepath}",
+                    source_file,
+                    r"include=\"?" + re.escape(include_filepath),
+                )
+            )
+
+        for key in ["from", "to"]:
+            try:
+                parse_line_number(attributes.get(key))
+            except ValueError:
+                problems.append(
+                    self._make_problem(
+                        f"Invalid '{key}' line number: {attributes[key]}",
+                        source_file,
+                        key + r"=\"?" + re.escape(attributes[key]),
+                    )
+                )
+
+        return problems
+
+    def _validate_image(
+        self, image: dict[str, Any], source_file: Path
+    ) -> list[ContentProblem]:
+        src = get_image_src(image)
+
+        pattern = re.escape("](" + src)
+
+        # NOTE: LaTeX can only include local files and '_extract_media' doesn't
+        # download or decode images, so these would otherwise fail in LaTeX with
+        # an unclear error. Data URIs are reported without their data.
+        if src.startswith("data:"):
+            return [
+                self._make_problem(
+                    "Data URI images aren't supported, save the image to a file",
+                    source_file,
+                    re.escape("](data:"),
+                )
+            ]
+
+        if "://" in src:
+            return [
+                self._make_problem(
+                    f"Remote images aren't supported, download the image: {src}",
+                    source_file,
+                    pattern,
+                )
+            ]
+
+        if Path(src).is_file():
+            return []
+
+        return [self._make_problem(f"Image not found: {src}", source_file, pattern)]
+
+    def _make_problem(
+        self, message: str, source_file: Path, pattern: str
+    ) -> ContentProblem:
+        return ContentProblem(
+            message=message,
+            source_file=source_file,
+            line_number=self._find_line_number(source_file, pattern),
+        )
+
+    def _find_line_number(self, source_file: Path, pattern: str) -> int | None:
+        # NOTE: Pandoc JSON has no source positions (the 'sourcepos' extension
+        # wraps inlines in Spans, which the Lua filters don't expect), so the
+        # line is the first one of the source file that matches the pattern.
+        if (lines := self._source_lines.get(source_file)) is None:
+            try:
+                lines = source_file.read_text().splitlines()
+            except (OSError, UnicodeDecodeError):
+                lines = []
+            self._source_lines[source_file] = lines
+
+        compiled_pattern = re.compile(pattern)
+
+        for i, line in enumerate(lines, start=1):
+            if compiled_pattern.search(line):
+                return i
+
+        return None
+
+
+def _get_element_identifier(element: dict[str, Any]) -> str | None:
+    if element["t"] == "Header":
+        identifier: str = element["c"][1][0]
+        return identifier
+    elif element["t"] in _ELEMENTS_WITH_ATTR:
+        identifier = element["c"][0][0]
+        return identifier
+    else:
+        return None
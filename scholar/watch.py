@@ -0,0 +1,52 @@
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+FileSnapshot = dict[Path, tuple[int, int] | None]
+
+
+class FileWatcher:
+    def __init__(self, *, poll_interval: float, debounce_interval: float) -> None:
+        self.poll_interval = poll_interval
+        self.debounce_interval = debounce_interval
+
+    def take_snapshot(self, files: Iterable[Path]) -> FileSnapshot:
+        return {file: _stat_file(file) for file in files}
+
+    def wait_for_changes(
+        self, files: Iterable[Path], snapshot: FileSnapshot | None = None
+    ) -> list[Path]:
+        # NOTE: Files that aren't in the snapshot (e.g. the ones we learned about
+        # during the last build) are compared against their current state.
+        initial_snapshot = {**self.take_snapshot(files), **(snapshot or {})}
+
+        current_snapshot = initial_snapshot
+        while current_snapshot == initial_snapshot:
+            time.sleep(self.poll_interval)
+            current_snapshot = self.take_snapshot(initial_snapshot)
+
+        # NOTE: Editors tend to save files in bursts (e.g. write a temporary file,
+        # rename it, touch it again), so we wait until the files settle down.
+        while True:
+            time.sleep(self.debounce_interval)
+            settled_snapshot = self.take_snapshot(initial_snapshot)
+
+            if settled_snapshot == current_snapshot:
+                break
+
+            current_snapshot = settled_snapshot
+
+        return [
+            file
+            for file in initial_snapshot
+            if current_snapshot[file] != initial_snapshot[file]
+        ]
+
+
+def _stat_file(file: Path) -> tuple[int, int] | None:
+    try:
+        stat = file.stat()
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size